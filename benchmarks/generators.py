@@ -0,0 +1,146 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Deterministic synthetic networks for the benchmarks
+"""
+import math
+import random
+
+# needs of the nodes: transit, users and producers
+_NEEDS = (0., 3., 5., -5.)
+
+
+def _node(rng, an_id, x, y):
+    return {'ID': an_id, 'coords': (x, y), 'need': rng.choice(_NEEDS), 'penalty': 2.}
+
+
+def _edges(pairs, capacity=10.):
+    return [
+        {'ID': k, 'start_id': start_id, 'stop_id': stop_id, 'capacity': capacity}
+        for k, (start_id, stop_id) in enumerate(pairs)
+    ]
+
+
+def grid(n, seed=0):
+    """
+    Square grid of about n nodes with slightly displaced positions, each node is connected
+        to its right and upper neighbour.
+    :param n: number of nodes, rounded to a square number
+    :param seed: seed of the random numbers
+    :return: tuple (nodes, edges) of dicts as taken by TVis
+    """
+    rng = random.Random(seed)
+    side = max(2, int(round(n ** 0.5)))
+    nodes = [
+        _node(rng, i * side + j, i + 0.3 * rng.random(), j + 0.3 * rng.random())
+        for i in xrange(side) for j in xrange(side)
+    ]
+    pairs = []
+    for i in xrange(side):
+        for j in xrange(side):
+            if j + 1 < side:
+                pairs.append((i * side + j, i * side + j + 1))
+            if i + 1 < side:
+                pairs.append((i * side + j, (i + 1) * side + j))
+    return nodes, _edges(pairs)
+
+
+def random_geometric(n, degree=4, seed=0):
+    """
+    Nodes placed uniformly in the unit square, connected if they are closer than a radius
+        chosen such that a node has about degree neighbours.
+    :param n: number of nodes
+    :param degree: expected number of neighbours of a node
+    :param seed: seed of the random numbers
+    :return: tuple (nodes, edges)
+    """
+    rng = random.Random(seed)
+    nodes = [_node(rng, k, rng.random(), rng.random()) for k in xrange(n)]
+    radius = math.sqrt(degree / (math.pi * n))
+    # bin the nodes into cells of the size of the radius, only neighbouring cells are compared
+    cells = {}
+    for node in nodes:
+        x, y = node['coords']
+        cells.setdefault((int(x / radius), int(y / radius)), []).append(node)
+    pairs = []
+    for node in nodes:
+        x, y = node['coords']
+        cell_x, cell_y = int(x / radius), int(y / radius)
+        for d_x in (-1, 0, 1):
+            for d_y in (-1, 0, 1):
+                for other in cells.get((cell_x + d_x, cell_y + d_y), ()):
+                    if other['ID'] > node['ID']:
+                        o_x, o_y = other['coords']
+                        if (x - o_x) ** 2 + (y - o_y) ** 2 < radius ** 2:
+                            pairs.append((node['ID'], other['ID']))
+    return nodes, _edges(pairs)
+
+
+def scale_free(n, m=2, seed=0):
+    """
+    Preferential attachment (Barabasi-Albert) network at random positions: each new node
+        is connected to m existing nodes chosen proportional to their degree.
+    :param n: number of nodes
+    :param m: number of edges of a new node
+    :param seed: seed of the random numbers
+    :return: tuple (nodes, edges)
+    """
+    rng = random.Random(seed)
+    nodes = [_node(rng, k, rng.random(), rng.random()) for k in xrange(n)]
+    pairs = []
+    # every node appears once per edge it has
+    ends = range(m)
+    for new in xrange(m, n):
+        targets = set()
+        while len(targets) < m:
+            targets.add(rng.choice(ends))
+        for target in targets:
+            pairs.append((new, target))
+            ends.extend((new, target))
+    return nodes, _edges(pairs)
+
+
+def near_collinear(n, lines=4, seed=0):
+    """
+    Nodes on a few almost straight lines where edges skip over one or two nodes, so most
+        edges pass close to other nodes and need waypoints.
+    :param n: number of nodes
+    :param lines: number of lines
+    :param seed: seed of the random numbers
+    :return: tuple (nodes, edges)
+    """
+    rng = random.Random(seed)
+    per_line = max(4, n // lines)
+    nodes = []
+    pairs = []
+    for line in xrange(lines):
+        first = line * per_line
+        for k in xrange(per_line):
+            nodes.append(_node(rng, first + k, k, line * 3 + 0.05 * rng.random()))
+            if k:
+                pairs.append((first + k - 1, first + k))
+            if k >= 2:
+                pairs.append((first + k - 2, first + k))
+            if k >= 3 and rng.random() < 0.5:
+                pairs.append((first + k - 3, first + k))
+    return nodes, _edges(pairs)
+
+
+def flow_config(nodes, edges, seed=0):
+    """
+    A random configuration of the network as taken by TVis.load_config.
+    """
+    rng = random.Random(seed)
+    node_config = {
+        node['ID']: (rng.choice((0., 0., 0.5 * node['need'])), rng.random())
+        for node in nodes if node['need']
+    }
+    edge_config = {edge['ID']: rng.uniform(0, edge['capacity']) for edge in edges}
+    return node_config, edge_config
+
+
+GENERATORS = {
+    'grid': grid,
+    'random_geometric': random_geometric,
+    'scale_free': scale_free,
+    'near_collinear': near_collinear
+}
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Per stage timing of TVis on synthetic networks.
+
+    Example:
+        python benchmarks/run.py --sizes 100,1000,10000,100000 --output results.json
+        python benchmarks/run.py --sizes 100,1000 --compare results.json
+"""
+import os
+import sys
+import json
+import time
+import copy
+import shutil
+import argparse
+import platform
+import tempfile
+import matplotlib
+matplotlib.use('Agg')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import flowvis
+from flowvis.visualizer import TVis
+from flowvis.instrument import Instrumentation
+from generators import GENERATORS, flow_config
+
+# the stages in the order they are run
+STAGES = ('load', 'scaling', 'layout', 'artists', 'restyle', 'output')
+
+
+def _timed(timings, stage, function, *args, **kwargs):
+    started = time.time()
+    result = function(*args, **kwargs)
+    timings[stage] = time.time() - started
+    return result
+
+
+def run_case(nodes, edges, output_dir, render_mode='patches', optimize_layout=True, **layout_kwargs):
+    """
+    Run all stages once on a network.
+    :param nodes: node dicts, they are copied since TVis consumes them
+    :param edges: edge dicts
+    :param output_dir: directory for the output file
+    :return: tuple (timings, counts) of dicts, timings in seconds per stage, counts with the
+        size of the network and the counters of the instrumentation (e.g. waypoints_added)
+    """
+    timings = {}
+    nodes_copy, edges_copy = copy.deepcopy(nodes), copy.deepcopy(edges)
+    instrumentation = Instrumentation()
+    # no layout cache, the layout is optimized every time
+    tvis = _timed(
+        timings, 'load', TVis, nodes_copy, edges_copy,
+        layout_cache=None, use_pyplot=False, render_mode=render_mode, instrumentation=instrumentation
+    )
+
+    def scaling():
+        tvis.store.coords_changed()
+        tvis._scaling()
+    _timed(timings, 'scaling', scaling)
+    # node labels without ids fail in NodeVis._label, so the ids are shown
+    _timed(timings, 'layout', tvis.compute_layout, optimize_layout=optimize_layout, with_node_ids=True, **layout_kwargs)
+    _timed(timings, 'artists', tvis.create_figure)
+
+    def restyle():
+        tvis.load_config(flow_config(nodes, edges))
+        tvis.restyle()
+    _timed(timings, 'restyle', restyle)
+    filename = os.path.join(output_dir, 'benchmark.png')
+    _timed(timings, 'output', tvis.save_figure, filename)
+    counts = {
+        'nodes': len(tvis.nodes),
+        'edges': len(tvis.edges),
+        'segments': sum(len(edgevis.segments) for edgevis in tvis.edges_visualisations)
+    }
+    counts.update(instrumentation.report().counters)
+    tvis.close_figure()
+    return timings, counts
+
+
+def run(generators, sizes, repeat=1, max_layout_nodes=None, render_mode='patches', seed=0):
+    """
+    Run the stages for each generator and size.
+    :param max_layout_nodes: the layout of larger networks is not optimized, their layout stage
+        only places the edges as straight lines and is marked as such in the output (default: no limit)
+    :return: dict with the environment and a list of results
+    """
+    output_dir = tempfile.mkdtemp(prefix='flowvis_benchmark_')
+    results = []
+    try:
+        for name in generators:
+            for size in sizes:
+                nodes, edges = GENERATORS[name](size, seed=seed)
+                optimize_layout = max_layout_nodes is None or len(nodes) <= max_layout_nodes
+                runs = []
+                for _ in xrange(repeat):
+                    timings, counts = run_case(
+                        nodes, edges, output_dir, render_mode=render_mode, optimize_layout=optimize_layout
+                    )
+                    runs.append(timings)
+                result = {
+                    'generator': name,
+                    'size': size,
+                    'optimize_layout': optimize_layout,
+                    'counts': counts,
+                    # the fastest run is the least disturbed one
+                    'timings': {stage: min(timings[stage] for timings in runs) for stage in STAGES},
+                    'runs': runs
+                }
+                result['timings']['total'] = sum(result['timings'][stage] for stage in STAGES)
+                results.append(result)
+                _print_result(result)
+    finally:
+        shutil.rmtree(output_dir, ignore_errors=True)
+    return {
+        'flowvis_version': flowvis.__version__,
+        'python': platform.python_version(),
+        'matplotlib': matplotlib.__version__,
+        'platform': platform.platform(),
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'render_mode': render_mode,
+        'seed': seed,
+        'results': results
+    }
+
+
+def _print_result(result, reference=None):
+    line = '{:<18}{:>8}'.format(result['generator'], result['counts']['nodes'])
+    for stage in STAGES + ('total', ):
+        line += '  {}={:.3f}'.format(stage, result['timings'][stage])
+        if stage == 'layout' and not result['optimize_layout']:
+            line += '[not optimized]'
+        if reference is None:
+            continue
+        if stage in ('layout', 'total') and reference['optimize_layout'] != result['optimize_layout']:
+            # one of the layouts was optimized and the other not, the times can not be compared
+            line += '(n/a)'
+        else:
+            line += '({:.2f}x)'.format(result['timings'][stage] / max(reference['timings'][stage], 1e-9))
+    sys.stderr.write(line + '\n')
+
+
+def compare(report, reference):
+    """
+    Print the timings of report relative to the ones of reference for the cases in both.
+    """
+    reference_results = {(r['generator'], r['size']): r for r in reference['results']}
+    sys.stderr.write('relative to flowvis {} ({})\n'.format(reference['flowvis_version'], reference['time']))
+    for result in report['results']:
+        key = (result['generator'], result['size'])
+        if key in reference_results:
+            _print_result(result, reference_results[key])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Per stage timing of TVis on synthetic networks.')
+    parser.add_argument('--generators', default=','.join(sorted(GENERATORS)), help='comma separated generators')
+    parser.add_argument('--sizes', default='100,1000', help='comma separated numbers of nodes')
+    parser.add_argument('--repeat', type=int, default=1, help='runs per case, the fastest is reported')
+    parser.add_argument(
+        '--max-layout-nodes', type=int, default=None,
+        help='the layout of larger networks is not optimized and marked as such (default: no limit)'
+    )
+    parser.add_argument('--render-mode', default='patches', choices=('patches', 'arrays'))
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write the results as json to this file (default: stdout)')
+    parser.add_argument('--compare', help='json file of a previous run to compare with')
+    args = parser.parse_args(argv)
+    report = run(
+        args.generators.split(','), [int(size) for size in args.sizes.split(',')],
+        repeat=args.repeat, max_layout_nodes=args.max_layout_nodes, render_mode=args.render_mode, seed=args.seed
+    )
+    if args.compare:
+        with open(args.compare) as fd:
+            compare(report, json.load(fd))
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(report, fd, indent=2, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
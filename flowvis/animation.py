@@ -0,0 +1,75 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Animation of a network over a sequence of flow configurations
+"""
+import os
+import errno
+import shutil
+from matplotlib import animation as mpl_animation
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as exception:
+        if exception.errno != errno.EEXIST:
+            raise
+
+
+def animate(tvis, configurations, output, fps=4, dpi=None, writer='ffmpeg', **kwargs):
+    """
+    Render one frame per configuration, all frames share the layout and the figure of tvis.
+
+    The configurations are consumed one at a time and each frame is written before the next
+        configuration is read, so a generator of any length can be animated in bounded memory.
+    The functional state (see TVis.load_attack) is left as it is for all frames.
+    :param tvis: the TVis to animate. If it has no figure yet, to_visual_elements is called first
+    :param configurations: iterable of configurations as passed to TVis.load_config
+    :param output: either a pattern for an image sequence with a field for the frame number,
+        e.g. 'frames/flow_{:05d}.png', or the file name of a video, e.g. 'flow.mp4'
+    :param fps: frames per second of a video
+    :param dpi: resolution of the frames (default: the one of the figure)
+    :param writer: name of the matplotlib.animation writer of a video, e.g. 'ffmpeg' or 'imagemagick'
+    :param kwargs: passed to TVis.to_visual_elements
+    :return: number of frames written
+    """
+    if tvis.fig_1 is None:
+        tvis.to_visual_elements(**kwargs)
+    # the margins are fixed once, such that the network does not move between frames
+    tvis.tight_layout()
+    dpi = dpi or tvis.fig_1.dpi
+    if '{' in output:
+        directory = os.path.dirname(output)
+        if directory:
+            _makedirs(directory)
+        frames = 0
+        for frames, filename in enumerate(_frames(tvis, configurations, output), 1):
+            if filename is None:
+                tvis.fig_1.savefig(output.format(frames - 1), dpi=dpi)
+            else:
+                # same state as the previous frame
+                shutil.copyfile(filename, output.format(frames - 1))
+        return frames
+    video_writer = mpl_animation.writers[writer](fps=fps)
+    frames = 0
+    with video_writer.saving(tvis.fig_1, output, dpi):
+        for frames, _ in enumerate(_frames(tvis, configurations, output), 1):
+            video_writer.grab_frame()
+    return frames
+
+
+def _frames(tvis, configurations, output):
+    """
+    Bring tvis into the state of each configuration in turn, the figure is only updated if
+        a node or edge changed.
+    :return: generator yielding None for each updated frame, the file name of the previous
+        frame (if output is a pattern) otherwise
+    """
+    for k, configuration in enumerate(configurations):
+        tvis.load_config(configuration)
+        if k and not (tvis.store.dirty_nodes or tvis.store.dirty_edges):
+            yield output.format(k - 1) if '{' in output else output
+            continue
+        # only the changed nodes and edges are drawn again
+        tvis.restyle()
+        yield None
@@ -0,0 +1,140 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Rendering of many scenarios in parallel worker processes
+"""
+import os
+import time
+import shutil
+import inspect
+import tempfile
+import traceback
+from multiprocessing import Pool, cpu_count
+from scenario import Scenario
+from cache import LayoutCache, files_key
+
+
+def _job(scenario):
+    """
+    Normalize a job given as (input_path, output_dir) tuple or as dict.
+    """
+    if isinstance(scenario, dict):
+        job = dict(scenario)
+    else:
+        job = {'input_path': scenario[0], 'output_dir': scenario[1]}
+    job.setdefault('nodes_file', os.path.join(job['input_path'], 'input', 'nodes.txt'))
+    job.setdefault('edges_file', os.path.join(job['input_path'], 'input', 'edges.txt'))
+    return job
+
+
+def _network_key(job):
+    """
+    Hash of the node and edge files, scenarios with the same key share their layout.
+    """
+    return files_key(job['nodes_file'], job['edges_file'])
+
+
+def _scenario(job, parsers, cache_path, scenario_kwargs):
+    kwargs = dict(scenario_kwargs)
+    kwargs.update({k: job[k] for k in ('nodes_file', 'edges_file', 'attack_file', 'solution_file') if k in job})
+    kwargs.setdefault('use_pyplot', False)
+    kwargs['layout_cache'] = LayoutCache(path=cache_path)
+    return Scenario(job['input_path'], *parsers, **kwargs)
+
+
+def _compute_layout(args):
+    """
+    Worker: optimize the layout of a network and store it in the shared layout cache.
+    """
+    job, parsers, cache_path, scenario_kwargs, layout_kwargs = args
+    started = time.time()
+    try:
+        scenario = _scenario(job, parsers, cache_path, scenario_kwargs)
+        scenario.tvis.compute_layout(**layout_kwargs)
+        error = None
+    except Exception:
+        error = traceback.format_exc()
+    return {'input_path': job['input_path'], 'time': time.time() - started, 'error': error}
+
+
+def _render(args):
+    """
+    Worker: visualize a single scenario, never raises.
+    """
+    job, parsers, cache_path, scenario_kwargs, visualize_kwargs = args
+    report = {
+        'input_path': job['input_path'], 'output_dir': job['output_dir'],
+        'ok': False, 'error': None, 'timings': {}, 'time': None
+    }
+    started = time.time()
+    try:
+        scenario = _scenario(job, parsers, cache_path, scenario_kwargs)
+        scenario.visualize(job['output_dir'], **visualize_kwargs)
+        report['timings'] = scenario.timings
+        report['ok'] = True
+    except Exception:
+        report['error'] = traceback.format_exc()
+    report['time'] = time.time() - started
+    return report
+
+
+def render_batch(
+        scenarios, workers=None,
+        node_parser=None, edge_parser=None, attack_parser=None, solution_parser=None,
+        layout_cache_path=None, scenario_kwargs=None, **kwargs
+):
+    """
+    Visualize many scenarios using a pool of worker processes.
+
+    Scenarios on the same network (identical node and edge files) share their layout: it is optimized
+        once, stored in a layout cache on disk and read by all workers rendering these scenarios.
+    A failing scenario does not stop the batch, its error is reported instead.
+    :param scenarios: list of jobs, either tuples (input_path, output_dir) or dicts with the keys
+        'input_path' and 'output_dir' and optionally 'nodes_file', 'edges_file', 'attack_file' and
+        'solution_file', e.g. to render several solutions of the same network
+    :param workers: number of worker processes (default: number of CPUs), 1 renders in this process
+    :param node_parser: see Scenario, needs to be picklable (i.e. a module level function)
+    :param edge_parser: see Scenario
+    :param attack_parser: see Scenario
+    :param solution_parser: see Scenario
+    :param layout_cache_path: directory for the shared layouts, kept after the batch. By default
+        a temporary directory is used and removed at the end
+    :param scenario_kwargs: further arguments passed to Scenario (default: use_pyplot=False)
+    :param kwargs: passed to Scenario.visualize
+    :return: list of reports, one dict per job in the order of scenarios, with the keys 'input_path',
+        'output_dir', 'ok', 'error' (the traceback if the job failed), 'timings' (seconds per output)
+        and 'time' (seconds for the whole job)
+    """
+    jobs = [_job(scenario) for scenario in scenarios]
+    parsers = (node_parser, edge_parser, attack_parser, solution_parser)
+    scenario_kwargs = scenario_kwargs or {}
+    workers = workers or cpu_count()
+    remove_cache = layout_cache_path is None
+    cache_path = layout_cache_path or tempfile.mkdtemp(prefix='flowvis_layouts_')
+    # the arguments of visualize that are not layout parameters
+    visualize_args = set(inspect.getargspec(Scenario.visualize).args)
+    layout_kwargs = {k: v for k, v in kwargs.items() if k not in visualize_args}
+    pool = Pool(workers) if workers > 1 else None
+    _map = pool.map if pool is not None else map
+    try:
+        # one job per network that is used more than once optimizes the shared layout
+        by_network = {}
+        for job in jobs:
+            try:
+                by_network.setdefault(_network_key(job), []).append(job)
+            except (IOError, OSError):
+                # reported by the rendering of the job
+                pass
+        shared = [
+            (network_jobs[0], parsers, cache_path, scenario_kwargs, layout_kwargs)
+            for network_jobs in by_network.values() if len(network_jobs) > 1
+        ]
+        if shared:
+            _map(_compute_layout, shared)
+        reports = _map(_render, [(job, parsers, cache_path, scenario_kwargs, kwargs) for job in jobs])
+    finally:
+        if pool is not None:
+            pool.close()
+            pool.join()
+        if remove_cache:
+            shutil.rmtree(cache_path, ignore_errors=True)
+    return reports
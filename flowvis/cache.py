@@ -0,0 +1,98 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Cache for the optimized edge segments of a network layout
+"""
+import os
+import errno
+import hashlib
+from collections import OrderedDict
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+
+def layout_key(*parts):
+    """
+    Compute a key from the elements that determine a layout.
+    :param parts: any number of objects with a stable repr (tuples, lists, numbers, strings)
+    :return: hex digest
+    """
+    return hashlib.sha1(repr(parts)).hexdigest()
+
+
+def files_key(*file_names):
+    """
+    Compute a key from the content of files, e.g. the node and edge files of a network.
+    :param file_names: paths of the files, their order matters
+    :return: hex digest
+    """
+    digest = hashlib.sha1()
+    for file_name in file_names:
+        with open(file_name, 'rb') as fd:
+            for chunk in iter(lambda: fd.read(1 << 20), b''):
+                digest.update(chunk)
+        # separate the files
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class LayoutCache():
+    def __init__(self, maxsize=16, path=None):
+        """
+        Least recently used cache for layouts, optionally backed by a directory on disk.
+
+        :param maxsize: maximal number of layouts kept in memory
+        :type maxsize: int
+        :param path: directory in which layouts are stored as pickle files (optional)
+        :type path: str
+        :return:
+        """
+        self.maxsize = maxsize
+        self.path = path
+        self._entries = OrderedDict()
+        if self.path:
+            try:
+                os.makedirs(self.path)
+            except OSError as exception:
+                if exception.errno != errno.EEXIST:
+                    raise
+
+    def _file(self, key):
+        return os.path.join(self.path, '{}.pkl'.format(key))
+
+    def get(self, key):
+        """
+        Return the layout stored under key or None if there is none.
+        """
+        if key in self._entries:
+            value = self._entries.pop(key)
+            self._entries[key] = value
+            return value
+        if self.path and os.path.isfile(self._file(key)):
+            with open(self._file(key), 'rb') as fd:
+                value = pickle.load(fd)
+            self._remember(key, value)
+            return value
+        return None
+
+    def put(self, key, value):
+        self._remember(key, value)
+        if self.path:
+            # write to a temporary file first such that no partial layout can be read
+            tmp_file = '{}.{}.tmp'.format(self._file(key), os.getpid())
+            with open(tmp_file, 'wb') as fd:
+                pickle.dump(value, fd, pickle.HIGHEST_PROTOCOL)
+            os.rename(tmp_file, self._file(key))
+
+    def _remember(self, key, value):
+        self._entries.pop(key, None)
+        self._entries[key] = value
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        """
+        Empty the in-memory part of the cache.
+        """
+        self._entries.clear()
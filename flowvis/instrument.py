@@ -0,0 +1,165 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Timers and counters for the stages of a rendering
+"""
+import time
+from functools import wraps
+
+
+class _Stage():
+    def __init__(self, instrumentation, name):
+        self.instrumentation = instrumentation
+        self.name = name
+
+    def __enter__(self):
+        self.instrumentation._enter(self.name)
+        return self
+
+    def __exit__(self, *exc_info):
+        self.instrumentation._exit()
+        return False
+
+
+class Instrumentation():
+    def __init__(self, hooks=()):
+        """
+        Collects the time spent in each stage and counters of what was done, e.g. the number
+            of waypoints added or patches drawn. Pass it as instrumentation to TVis or Scenario.
+
+        Stages can be nested, a stage is recorded under the names of the enclosing stages
+            joined by '/', e.g. 'visualize/solution_after/save_figure'.
+        :param hooks: callables hook(event, name, value) that are called with event 'stage'
+            whenever a stage ends (value: seconds spent) and with event 'count' whenever a
+            counter is increased (value: the increment)
+        :return:
+        """
+        self.enabled = True
+        self.hooks = list(hooks)
+        self.reset()
+
+    def reset(self):
+        # stage -> [seconds, number of calls], in the order the stages were first entered
+        self.stages = {}
+        self._order = []
+        self.counters = {}
+        self._stack = []
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def stage(self, name):
+        """
+        Context manager timing the code run within it as stage name.
+        """
+        return _Stage(self, name)
+
+    def _enter(self, name):
+        path = '/'.join([stage_path for stage_path, started in self._stack[-1:]] + [name])
+        if path not in self.stages:
+            self.stages[path] = [0., 0]
+            self._order.append(path)
+        self._stack.append((path, time.time()))
+
+    def _exit(self):
+        ended = time.time()
+        path, started = self._stack.pop()
+        self.stages[path][0] += ended - started
+        self.stages[path][1] += 1
+        for hook in self.hooks:
+            hook('stage', path, ended - started)
+
+    def count(self, name, value=1):
+        """
+        Increase the counter name by value.
+        """
+        self.counters[name] = self.counters.get(name, 0) + value
+        for hook in self.hooks:
+            hook('count', name, value)
+
+    def report(self):
+        """
+        :return: Report of the stages and counters collected so far
+        """
+        return Report(
+            [(path, self.stages[path][0], self.stages[path][1]) for path in self._order], dict(self.counters)
+        )
+
+
+class _NoInstrumentation():
+    """
+    Used when no instrumentation is given, does nothing.
+    """
+    enabled = False
+
+    def __init__(self):
+        self._stage = _NoStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def count(self, name, value=1):
+        pass
+
+
+class _NoStage():
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+NO_INSTRUMENTATION = _NoInstrumentation()
+
+
+class Report():
+    def __init__(self, stages, counters):
+        """
+        Result of an Instrumentation.
+
+        :param stages: list of (path, seconds, calls) tuples in the order the stages were first entered
+        :param counters: dict name -> value
+        :return:
+        """
+        self.stages = stages
+        self.counters = counters
+
+    def seconds(self, path):
+        """
+        Total time spent in a stage, 0 if it was never entered.
+        """
+        for stage_path, seconds, calls in self.stages:
+            if stage_path == path:
+                return seconds
+        return 0.
+
+    def as_dict(self):
+        """
+        :return: dict that can be written as json
+        """
+        return {
+            'stages': [{'stage': path, 'seconds': seconds, 'calls': calls} for path, seconds, calls in self.stages],
+            'counters': dict(self.counters)
+        }
+
+    def __str__(self):
+        lines = []
+        for path, seconds, calls in self.stages:
+            parts = path.split('/')
+            lines.append('{:<48}{:>10.4f}s{:>7}x'.format('  ' * (len(parts) - 1) + parts[-1], seconds, calls))
+        for name in sorted(self.counters):
+            lines.append('{:<48}{:>12}'.format(name, self.counters[name]))
+        return '\n'.join(lines)
+
+
+def staged(name):
+    """
+    Decorator timing a method as stage name of the instrumentation of its object.
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, *args, **kwargs):
+            with self.instrumentation.stage(name):
+                return method(self, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,148 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Batched drawing of the node and edge labels
+"""
+from collections import OrderedDict
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.collections import PathCollection
+from matplotlib.font_manager import FontProperties
+from matplotlib.patches import BoxStyle
+from matplotlib.textpath import TextToPath
+from matplotlib.transforms import Affine2D
+
+_text_to_path = TextToPath()
+
+
+def _cached(cache, key, maxsize, compute):
+    """
+    Least recently used lookup: return cache[key], computing and adding it if missing.
+    :param cache: OrderedDict, the least recently used entries are dropped beyond maxsize
+    :param compute: function returning the value of key
+    """
+    if key in cache:
+        value = cache.pop(key)
+    else:
+        value = compute()
+        while len(cache) >= maxsize:
+            cache.popitem(last=False)
+    cache[key] = value
+    return value
+
+
+class LabelLayer():
+    def __init__(self, ax, min_label_px=0, min_box_px=0, zorder=3, clip=False, cache_size=4096):
+        """
+        Draws labels as plain Text artists and all the boxes around them as a single collection.
+
+        :param ax: the axes to draw on
+        :param min_label_px: labels with a font size below this many pixels (at the output
+            resolution) are not drawn
+        :type min_label_px: float
+        :param min_box_px: labels with a font size below this many pixels are drawn without box
+        :type min_box_px: float
+        :param zorder: zorder of the texts, the boxes are drawn just below
+        :param clip: if True, the texts are cut at the border of the axes like the boxes are,
+            otherwise they can reach beyond it
+        :param cache_size: number of measured texts and of box paths that are kept. The caches
+            belong to the layer, so they are dropped with the figure it draws on
+        :return:
+        """
+        self.ax = ax
+        self.min_label_px = min_label_px
+        self.min_box_px = min_box_px
+        self.zorder = zorder
+        self.clip = clip
+        self.texts = []
+        # the label each text currently shows, unchanged texts are not updated
+        self._shown = []
+        # the box paths are in points, placed at the label coordinates like scatter markers
+        self.boxes = PathCollection(
+            [], offsets=np.zeros((0, 2)), transOffset=ax.transData, zorder=zorder - 0.1, alpha=0.8
+        )
+        self.boxes.set_transform(Affine2D().scale(1 / 72.) + ax.figure.dpi_scale_trans)
+        ax.add_collection(self.boxes, autolim=False)
+        self.cache_size = cache_size
+        self._fonts = {}
+        # (text, size) -> extent and (text, size, ha, va) -> box path, both in points
+        self._extents = OrderedDict()
+        self._boxes = OrderedDict()
+        self._box_style = BoxStyle('round', pad=0.3)
+
+    def _font(self, size):
+        if size not in self._fonts:
+            self._fonts[size] = FontProperties(size=size)
+        return self._fonts[size]
+
+    def _extent(self, text, size):
+        """
+        Width, height and descent of a text in points, the height is at least the one of a line.
+        """
+        def measure():
+            prop = self._font(size)
+            width, height, descent = _text_to_path.get_text_width_height_descent(text, prop, ismath=False)
+            _, lp_height, lp_descent = _text_to_path.get_text_width_height_descent('lp', prop, ismath=False)
+            return width, max(height, lp_height), max(descent, lp_descent)
+        return _cached(self._extents, (text, size), self.cache_size, measure)
+
+    def _box(self, text, size, ha, va):
+        def box():
+            width, height, descent = self._extent(text, size)
+            x0 = {'center': -width / 2., 'right': -width}.get(ha, 0.)
+            y0 = {'center': -height / 2., 'top': -height, 'baseline': -descent}.get(va, 0.)
+            return self._box_style(x0, y0, width, height, size)
+        return _cached(self._boxes, (text, size, ha, va), self.cache_size, box)
+
+    def set_labels(self, labels, box_fc, box_ec):
+        """
+        Draw the labels, reusing the Text artists that are already on the axes.
+        :param labels: list of label tuples (text, coords, properties). The properties are passed to the
+            Text artist, except for 'box' (whether to draw a box) and 'box_fc' (the color of the box)
+        :param box_fc: default face color of the boxes
+        :param box_ec: edge color of the boxes
+        :return:
+        """
+        savefig_dpi = rcParams['savefig.dpi']
+        dpi = self.ax.figure.dpi if savefig_dpi == 'figure' else savefig_dpi
+        px_per_pt = dpi / 72.
+        box_paths = []
+        box_offsets = []
+        box_colors = []
+        nbr_texts = 0
+        for a_label in labels:
+            props = dict(a_label[2])
+            size = props.get('size', rcParams['font.size'])
+            # level of detail: skip what can not be read anyway
+            if size * px_per_pt < self.min_label_px:
+                continue
+            fc = props.pop('box_fc', box_fc)
+            if props.pop('box', True) and size * px_per_pt >= self.min_box_px:
+                box_paths.append(self._box(
+                    a_label[0], size,
+                    props.get('horizontalalignment', 'left'), props.get('verticalalignment', 'baseline')
+                ))
+                box_offsets.append(a_label[1])
+                box_colors.append(fc)
+            if nbr_texts < len(self.texts):
+                if self._shown[nbr_texts] != a_label:
+                    text = self.texts[nbr_texts]
+                    text.set_text(a_label[0])
+                    text.set_position(a_label[1])
+                    text.update(props)
+                    self._shown[nbr_texts] = a_label
+            else:
+                self.texts.append(self.ax.text(
+                    a_label[1][0], a_label[1][1], a_label[0], zorder=self.zorder, clip_on=self.clip, **props
+                ))
+                self._shown.append(a_label)
+            nbr_texts += 1
+        # remove the texts that are no longer needed
+        for text in self.texts[nbr_texts:]:
+            text.remove()
+        del self.texts[nbr_texts:]
+        del self._shown[nbr_texts:]
+        self.boxes.set_paths(box_paths)
+        self.boxes.set_offsets(np.array(box_offsets, dtype=float).reshape(-1, 2))
+        self.boxes.set_facecolor(box_colors)
+        self.boxes.set_edgecolor(box_ec)
+        self.boxes.set_alpha(0.8)
@@ -0,0 +1,385 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Array based helpers for the layout optimization of TVis
+"""
+from math import floor
+import numpy as np
+
+
+def segment_point_distances(starts, stops, points):
+    """
+    Compute for segment/point pairs the orthogonal distance of the point
+    to the line through the segment and the scale of its projection onto the segment.
+
+    The arrays are broadcast against each other, pass e.g. starts[:, None] and points[None]
+    to get all combinations.
+    The arithmetic follows packages.vecpy.Vector step by step, such that the
+    results match the ones obtained with Vector objects.
+    :param starts: array of shape (..., 2) holding the start coordinates of the segments
+    :param stops: array of shape (..., 2) holding the end coordinates of the segments
+    :param points: array of shape (..., 2) holding the coordinates of the points
+    :return: tuple (ortho, scale, length): the orthogonal distances, the projection
+        scales and the lengths of the segments
+    """
+    starts = np.asarray(starts, dtype=float)
+    stops = np.asarray(stops, dtype=float)
+    points = np.asarray(points, dtype=float)
+    seg_x = stops[..., 0] - starts[..., 0]
+    seg_y = stops[..., 1] - starts[..., 1]
+    p_x = points[..., 0] - starts[..., 0]
+    p_y = points[..., 1] - starts[..., 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        squared_length = seg_x * seg_x + seg_y * seg_y
+        length = np.sqrt(squared_length)
+        scale = (seg_x * p_x + seg_y * p_y) / squared_length
+        # Vector.__xor__ returns the unit vector for a scale of 0
+        fct = np.where(scale != 0, scale, 1 / length)
+        o_x = seg_x * fct - p_x
+        o_y = seg_y * fct - p_y
+        ortho = np.sqrt(o_x * o_x + o_y * o_y)
+    return ortho, scale, length
+
+
+def segment_cells(cell_size, start, stop, margin):
+    """
+    Return the cells of a grid with the given cell size that are within margin of the
+        segment from start to stop along each axis, a cell is given by its column and row.
+    """
+    if start[0] > stop[0]:
+        start, stop = stop, start
+    (x0, y0), (x1, y1) = start[:2], stop[:2]
+    c = cell_size
+    cells = []
+    for cx in xrange(int(floor((x0 - margin) / c)), int(floor((x1 + margin) / c)) + 1):
+        # part of the segment that is relevant for this column of cells
+        x_a = max(x0, cx * c - margin)
+        x_b = min(x1, (cx + 1) * c + margin)
+        if x1 == x0:
+            y_a, y_b = y0, y1
+        else:
+            y_a = y0 + (x_a - x0) * (y1 - y0) / (x1 - x0)
+            y_b = y0 + (x_b - x0) * (y1 - y0) / (x1 - x0)
+        for cy in xrange(int(floor((min(y_a, y_b) - margin) / c)), int(floor((max(y_a, y_b) + margin) / c)) + 1):
+            cells.append((cx, cy))
+    return cells
+
+
+def segments_in_box(starts, stops, box):
+    """
+    Find the segments that intersect an axis aligned box, including the ones that lie
+        completely within it.
+    :param starts: array of shape (N, 2) with the start coordinates of the segments
+    :param stops: array of shape (N, 2) with the end coordinates of the segments
+    :param box: (x_min, y_min, x_max, y_max)
+    :return: boolean array of shape (N,)
+    """
+    starts = np.asarray(starts, dtype=float).reshape(-1, 2)
+    stops = np.asarray(stops, dtype=float).reshape(-1, 2)
+    # clip the parameter t of start + t * (stop - start) to the slab of each axis
+    t_in = np.zeros(len(starts))
+    t_out = np.ones(len(starts))
+    inside = np.ones(len(starts), dtype=bool)
+    for k, low, high in ((0, box[0], box[2]), (1, box[1], box[3])):
+        delta = stops[:, k] - starts[:, k]
+        parallel = delta == 0
+        inside &= ~(parallel & ((starts[:, k] < low) | (starts[:, k] > high)))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t_low = (low - starts[:, k]) / delta
+            t_high = (high - starts[:, k]) / delta
+        t_in = np.where(parallel, t_in, np.maximum(t_in, np.minimum(t_low, t_high)))
+        t_out = np.where(parallel, t_out, np.minimum(t_out, np.maximum(t_low, t_high)))
+    return inside & (t_in <= t_out)
+
+
+def box_cells(cell_size, box):
+    """
+    Return the cells of a grid with the given cell size that overlap box (x_min, y_min, x_max, y_max).
+    """
+    c = cell_size
+    return [
+        (cx, cy)
+        for cx in xrange(int(floor(box[0] / c)), int(floor(box[2] / c)) + 1)
+        for cy in xrange(int(floor(box[1] / c)), int(floor(box[3] / c)) + 1)
+    ]
+
+
+class PointGrid():
+    def __init__(self, cell_size, points=()):
+        """
+        Uniform grid over 2D points allowing to look up the points close to a segment.
+
+        :param cell_size: side length of a grid cell, ideally of the order of the query distance
+        :type cell_size: float
+        :param points: initial points, their position in the sequence is used as id
+        :return:
+        """
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.positions = {}
+        for an_id, coords in enumerate(points):
+            self.add(an_id, coords)
+
+    def _cell(self, coords):
+        return (
+            int(floor(coords[0] / self.cell_size)),
+            int(floor(coords[1] / self.cell_size))
+        )
+
+    def add(self, an_id, coords):
+        self.positions[an_id] = coords
+        self.cells.setdefault(self._cell(coords), []).append(an_id)
+
+    def update(self, an_id, coords):
+        """
+        Move an existing point to new coordinates.
+        """
+        old_cell = self._cell(self.positions[an_id])
+        new_cell = self._cell(coords)
+        self.positions[an_id] = coords
+        if old_cell != new_cell:
+            self.cells[old_cell].remove(an_id)
+            if not self.cells[old_cell]:
+                del self.cells[old_cell]
+            self.cells.setdefault(new_cell, []).append(an_id)
+
+    def query_segment(self, start, stop, margin):
+        """
+        Return the sorted ids of all points within the segment from start to stop
+        widened by margin in both directions along each axis.
+        Only the cells along the segment are visited, so long segments stay cheap.
+        :param start: coordinates of the start point
+        :param stop: coordinates of the end point
+        :param margin: distance by which the segment is widened
+        :return: list of ids
+        """
+        found = []
+        for cell in segment_cells(self.cell_size, start, stop, margin):
+            found.extend(self.cells.get(cell, ()))
+        found.sort()
+        return found
+
+    def query_point(self, coords, margin):
+        """
+        Return the sorted ids of all points within margin of coords along each axis.
+        """
+        return self.query_segment(coords, coords, margin)
+
+    def query_box(self, box):
+        """
+        Return the sorted ids of all points in the cells overlapping box (x_min, y_min, x_max, y_max),
+            the points close to its border might lie outside of it.
+        """
+        found = []
+        for cell in box_cells(self.cell_size, box):
+            found.extend(self.cells.get(cell, ()))
+        found.sort()
+        return found
+
+
+class CellIndex():
+    def __init__(self, cell_size):
+        """
+        Uniform grid over segments, the reverse of a PointGrid: it remembers for each key (e.g.
+            an edge) the cells its segments pass, such that the keys whose segments come close
+            to given coordinates are found without visiting all segments.
+
+        :param cell_size: side length of a grid cell, larger cells are cheaper to fill for long
+            segments but return more keys that are not actually close
+        :type cell_size: float
+        :return:
+        """
+        self.cell_size = float(cell_size)
+        self.cells = {}
+        self.keys = {}
+
+    def set(self, key, segments, margin):
+        """
+        Replace the segments of key.
+        :param segments: sequence of (start, stop) coordinate tuples
+        :param margin: distance by which the segments are widened along each axis
+        """
+        for cell in self.keys.get(key, ()):
+            self.cells[cell].discard(key)
+            if not self.cells[cell]:
+                del self.cells[cell]
+        cells = set()
+        for start, stop in segments:
+            cells.update(segment_cells(self.cell_size, start, stop, margin))
+        self.keys[key] = cells
+        for cell in cells:
+            self.cells.setdefault(cell, set()).add(key)
+
+    def query_point(self, coords):
+        """
+        Return the set of keys with a segment within margin (see set) of coords.
+        """
+        return self.cells.get(
+            (int(floor(coords[0] / self.cell_size)), int(floor(coords[1] / self.cell_size))), set()
+        )
+
+    def query_box(self, box):
+        """
+        Return the set of keys with a segment in the cells overlapping box (x_min, y_min, x_max, y_max),
+            the segments might pass close to the box without intersecting it.
+        """
+        found = set()
+        for cell in box_cells(self.cell_size, box):
+            found.update(self.cells.get(cell, ()))
+        return found
+
+
+class LinkGraph():
+    def __init__(self):
+        """
+        Undirected graph of the links between waypoints and nodes used by relax_graph.
+        It offers the few methods of networkx.Graph the layout optimization needs and stores
+            the links the same way, as dicts of neighbour -> {'weight': weight}.
+        :return:
+        """
+        self.adj = {}
+
+    def __contains__(self, n):
+        return n in self.adj
+
+    def __getitem__(self, n):
+        return self.adj[n]
+
+    def nodes(self):
+        return self.adj.keys()
+
+    def add_node(self, n):
+        if n not in self.adj:
+            self.adj[n] = {}
+
+    def add_edge(self, u, v, weight=1.):
+        self.add_node(u)
+        self.add_node(v)
+        data = self.adj[u].get(v, {})
+        data['weight'] = weight
+        self.adj[u][v] = data
+        self.adj[v][u] = data
+
+    def has_edge(self, u, v):
+        return u in self.adj and v in self.adj[u]
+
+    def remove_edge(self, u, v):
+        del self.adj[u][v]
+        if u != v:
+            del self.adj[v][u]
+
+    def to_networkx(self):
+        """
+        :return: the graph as networkx.Graph, e.g. to draw it
+        """
+        import networkx as nx
+        graph = nx.Graph()
+        graph.add_nodes_from(self.adj)
+        for u, neighbours in self.adj.items():
+            for v, data in neighbours.items():
+                graph.add_edge(u, v, weight=data['weight'])
+        return graph
+
+
+def relax(pos, nbr_fixed, edges, weights, k=1., iterations=1000, tol=1e-5, cooling='adaptive'):
+    """
+    Fruchterman-Reingold relaxation in which only the movable points are displaced.
+
+    The forces follow networkx.spring_layout: all points repel each other, linked points
+    attract each other in proportion to the weight of their link and the step size is given
+    by a temperature. The temperature is lowered as long as the forces do not decrease, so the
+    displacements shrink once the points oscillate around their equilibrium and the relaxation
+    stops when they fall below tol.
+    Forces are only computed for the movable points, anchors are never displaced.
+    :param pos: array of shape (N, 2), the first nbr_fixed rows are anchors, the others are movable
+    :param nbr_fixed: number of anchors
+    :param edges: int array of shape (L, 2) with the rows of linked points, the first row of each
+        pair has to be a movable point. Links between two movable points need to be present in
+        both directions
+    :param weights: array of shape (L,) with the weights of the links
+    :param k: optimal distance between points
+    :param iterations: maximal number of iterations
+    :param tol: stop as soon as no movable point is displaced by more than tol
+    :param cooling: 'adaptive' (default): the temperature decreases by a factor 0.9 whenever the
+        forces do not decrease and increases again after 5 steps in a row that lowered them.
+        'linear': the temperature decreases linearly to 0 over the iterations like in
+        networkx.spring_layout. Every step then displaces the points by the temperature, so tol
+        is only reached in the last iterations, use it to reproduce networkx.spring_layout.
+    :return: tuple (pos, nbr_iterations, reason) with the new positions, the number of iterations
+        run and why the relaxation stopped: 'converged' (tol reached), 'iterations' (budget used up)
+        or 'no_movable_points'
+    """
+    pos = np.array(pos, dtype=float).reshape(-1, 2)
+    edges = np.asarray(edges, dtype=int).reshape(-1, 2)
+    weights = np.asarray(weights, dtype=float)
+    movable = pos[nbr_fixed:]
+    if not len(movable):
+        return pos, 0, 'no_movable_points'
+    if cooling not in ('linear', 'adaptive'):
+        raise ValueError('Invalid cooling: {}'.format(cooling))
+    src = edges[:, 0] - nbr_fixed
+    dst = edges[:, 1]
+    # the initial temperature is about .1 of the domain
+    t = t_max = (pos.max(axis=0) - pos.min(axis=0)).max() * 0.1
+    dt = t / float(iterations + 1)
+    # for the adaptive cooling
+    energy = np.inf
+    progress = 0
+    iteration = 0
+    while iteration < iterations:
+        iteration += 1
+        # repulsion between each movable point and all points
+        delta = movable[:, None, :] - pos[None, :, :]
+        distance = np.sqrt((delta ** 2).sum(axis=-1))
+        np.clip(distance, 0.01, None, out=distance)
+        displacement = np.einsum('ijk,ij->ik', delta, k * k / distance ** 2)
+        # attraction along the links
+        link_delta = movable[src] - pos[dst]
+        link_distance = np.clip(np.sqrt((link_delta ** 2).sum(axis=-1)), 0.01, None)
+        np.add.at(displacement, src, -link_delta * (weights * link_distance / k)[:, None])
+        # displace by the temperature at most
+        squared_length = (displacement ** 2).sum(axis=-1)
+        length = np.sqrt(squared_length)
+        length = np.where(length < 0.01, 0.1, length)
+        delta_pos = displacement * (t / length)[:, None]
+        movable += delta_pos
+        if np.abs(delta_pos).max() < tol:
+            return pos, iteration, 'converged'
+        if cooling == 'linear':
+            t -= dt
+        else:
+            previous_energy, energy = energy, squared_length.sum()
+            if energy < previous_energy:
+                progress += 1
+                if progress >= 5:
+                    progress = 0
+                    t = min(t / 0.9, t_max)
+            else:
+                progress = 0
+                t *= 0.9
+    return pos, iteration, 'iterations'
+
+
+def relax_graph(graph, positions, nbr_fixed, k=1., iterations=1000, tol=1e-5, cooling='adaptive'):
+    """
+    Run relax on a layout graph in which all nodes with an id below nbr_fixed are fixed.
+
+    :param graph: LinkGraph or networkx graph with a 'weight' on each edge
+    :param positions: sequence of coordinates indexed by the node ids
+    :param nbr_fixed: number of fixed nodes
+    :return: tuple (positions, nbr_iterations, reason) with positions a dict mapping the ids of
+        the movable nodes to their new coordinates, see relax for the others
+    """
+    anchors = sorted(n for n in graph.nodes() if n < nbr_fixed)
+    movable = sorted(n for n in graph.nodes() if n >= nbr_fixed)
+    rows = {n: r for r, n in enumerate(anchors + movable)}
+    edges = []
+    weights = []
+    for n in movable:
+        for neighbour, data in graph[n].items():
+            edges.append((rows[n], rows[neighbour]))
+            weights.append(data.get('weight', 1.))
+    new_pos, nbr_iterations, reason = relax(
+        [positions[n] for n in anchors + movable], len(anchors), edges, weights,
+        k=k, iterations=iterations, tol=tol, cooling=cooling
+    )
+    return {n: tuple(new_pos[rows[n]]) for n in movable}, nbr_iterations, reason
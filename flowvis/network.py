@@ -0,0 +1,273 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Columnar storage of the node and edge attributes of a network
+"""
+import numpy as np
+
+# name, shape of a single entry, dtype and value of an unset entry
+_NODE_COLUMNS = (
+    ('coords', (2, ), float, np.nan),
+    ('need', (), float, np.nan),
+    ('coverage', (), float, np.nan),
+    ('penalty', (), float, np.nan),
+    ('strength', (), float, np.nan),
+    ('total_costs', (), float, np.nan),
+    ('functional', (), bool, True),
+)
+_EDGE_COLUMNS = (
+    ('start', (), int, -1),
+    ('stop', (), int, -1),
+    ('capacity', (), float, np.nan),
+    ('flux', (), float, np.nan),
+    ('unitcost', (), float, np.nan),
+    ('strength', (), float, np.nan),
+    ('functional', (), bool, True),
+)
+# the columns that change with an attack or a configuration, see NetworkStore.get_state
+_NODE_STATE = ('coverage', 'total_costs', 'functional')
+_EDGE_STATE = ('flux', 'functional')
+
+
+def _to_float(value):
+    """
+    Convert an attribute to its stored value, None is stored as NaN.
+    """
+    return np.nan if value is None else value
+
+
+def _from_float(value):
+    """
+    Convert a stored value back to an attribute, NaN is returned as None.
+    """
+    return None if value != value else float(value)
+
+
+def _changed(old, new):
+    """
+    Mask of the entries that differ between two arrays, NaN equals NaN.
+    """
+    changed = old != new
+    if old.dtype.kind == 'f':
+        changed &= ~(np.isnan(old) & np.isnan(new))
+    return changed
+
+
+def column_property(table, name):
+    """
+    Property reading and writing the row of a Node or Edge (attributes _store and _index)
+        in a column of its NetworkStore.
+    :param table: 'nodes_table' or 'edges_table'
+    :param name: name of the column
+    """
+    def getter(self):
+        value = getattr(self._store, table).arrays[name][self._index]
+        if name == 'functional':
+            return bool(value)
+        return _from_float(value)
+
+    def setter(self, value):
+        getattr(self._store, table).arrays[name][self._index] = value if name == 'functional' else _to_float(value)
+        getattr(self._store, 'dirty_nodes' if table == 'nodes_table' else 'dirty_edges').add(self._index)
+    return property(getter, setter)
+
+
+class _Table():
+    def __init__(self, columns, capacity=16):
+        """
+        Set of equally long arrays that grow by doubling their capacity.
+
+        :param columns: sequence of (name, shape, dtype, default) tuples
+        :param capacity: initial number of rows
+        :type capacity: int
+        :return:
+        """
+        self._columns = columns
+        self.size = 0
+        self.arrays = {}
+        for name, shape, dtype, default in columns:
+            self.arrays[name] = np.full((capacity, ) + shape, default, dtype=dtype)
+
+    def append(self, **values):
+        """
+        Add a row, the columns not in values are set to their default.
+        :return: index of the new row
+        """
+        capacity = len(self.arrays[self._columns[0][0]])
+        if self.size == capacity:
+            for name, shape, dtype, default in self._columns:
+                grown = np.full((max(2 * capacity, 1), ) + shape, default, dtype=dtype)
+                grown[:capacity] = self.arrays[name]
+                self.arrays[name] = grown
+        for name, value in values.items():
+            self.arrays[name][self.size] = value
+        self.size += 1
+        return self.size - 1
+
+    def __getitem__(self, name):
+        """
+        Return the filled part of a column, it is a view so it can be assigned to.
+        """
+        return self.arrays[name][:self.size]
+
+    def set_arrays(self, arrays):
+        """
+        Use existing arrays (e.g. memory mapped ones) as columns, all rows are considered filled.
+        :param arrays: dict name -> array, one for each column, all of the same length
+        """
+        self.size = len(arrays[self._columns[0][0]])
+        for name, shape, dtype, default in self._columns:
+            if arrays[name].shape != (self.size, ) + shape:
+                raise ValueError('Invalid shape of column {}: {}'.format(name, arrays[name].shape))
+            self.arrays[name] = arrays[name]
+
+
+class NetworkStore():
+    def __init__(self, capacity=16):
+        """
+        Holds the attributes of all nodes and edges of a network in numpy arrays, one
+            per attribute. Node and Edge objects are views on a row of these arrays,
+            such that the attributes of all elements can be read and set at once, e.g.
+            store.nodes_table['functional'][:] = True.
+        Unset numerical attributes (None) are stored as NaN.
+
+        :param capacity: number of nodes and edges for which memory is reserved initially
+        :type capacity: int
+        :return:
+        """
+        self.nodes_table = _Table(_NODE_COLUMNS, capacity)
+        self.edges_table = _Table(_EDGE_COLUMNS, capacity)
+        # the Node and Edge objects in the order of the rows
+        self.nodes = []
+        self.edges = []
+        # additional keyword arguments of the elements, only kept if there are any
+        self.node_kwargs = {}
+        self.edge_kwargs = {}
+        # rows whose values changed since the last clear_dirty, see update_column
+        self.dirty_nodes = set()
+        self.dirty_edges = set()
+        # last result of scaled_coords and the scaling it was computed for
+        self._scaling = None
+        self._scaled_coords = None
+
+    def add_node(self, node, coords, need, coverage, penalty, strength, total_costs, functional, kwargs):
+        index = self.nodes_table.append(
+            coords=(np.nan, np.nan) if coords is None else coords[:2],
+            need=_to_float(need), coverage=_to_float(coverage), penalty=_to_float(penalty),
+            strength=_to_float(strength), total_costs=_to_float(total_costs), functional=functional
+        )
+        self.nodes.append(node)
+        if kwargs:
+            self.node_kwargs[index] = kwargs
+        self.coords_changed()
+        return index
+
+    def add_edge(self, edge, start, stop, capacity, flux, unitcost, strength, functional, kwargs):
+        index = self.edges_table.append(
+            start=start, stop=stop,
+            capacity=_to_float(capacity), flux=_to_float(flux), unitcost=_to_float(unitcost),
+            strength=_to_float(strength), functional=functional
+        )
+        self.edges.append(edge)
+        if kwargs:
+            self.edge_kwargs[index] = kwargs
+        return index
+
+    def set_columns(self, node_arrays, edge_arrays, node_kwargs=None, edge_kwargs=None):
+        """
+        Fill an empty store with existing columns, see snapshot.load_snapshot.
+        The Node and Edge objects on the rows still need to be created.
+        """
+        self.nodes_table.set_arrays(node_arrays)
+        self.edges_table.set_arrays(edge_arrays)
+        self.node_kwargs = node_kwargs or {}
+        self.edge_kwargs = edge_kwargs or {}
+        self.coords_changed()
+
+    def get_state(self):
+        """
+        Copy the columns that are set by an attack or a configuration, see set_state.
+        :return: tuple (node_columns, edge_columns) of dicts name -> array
+        """
+        return (
+            {name: self.nodes_table[name].copy() for name in _NODE_STATE},
+            {name: self.edges_table[name].copy() for name in _EDGE_STATE}
+        )
+
+    def set_state(self, state):
+        """
+        Restore the columns of a state returned by get_state, the network must not have changed since.
+        """
+        for table_name, columns in (('nodes_table', state[0]), ('edges_table', state[1])):
+            for name, values in columns.items():
+                self.update_column(table_name, name, values)
+
+    def update_column(self, table_name, name, values, rows=None):
+        """
+        Write to a column, only the rows whose value changes are written and marked as dirty.
+        :param table_name: 'nodes_table' or 'edges_table'
+        :param name: name of the column
+        :param values: new values, a single one or one per row
+        :param rows: int array of the rows to write (default: all rows)
+        :return: int array of the rows that changed
+        """
+        column = getattr(self, table_name)[name]
+        if rows is None:
+            rows = np.arange(len(column))
+        values = np.broadcast_to(np.asarray(values, dtype=column.dtype), rows.shape)
+        changed = _changed(column[rows], values)
+        rows = rows[changed]
+        column[rows] = values[changed]
+        (self.dirty_nodes if table_name == 'nodes_table' else self.dirty_edges).update(rows.tolist())
+        return rows
+
+    def clear_dirty(self):
+        """
+        Forget the changed rows, e.g. once the elements are drawn in their current state.
+        """
+        self.dirty_nodes.clear()
+        self.dirty_edges.clear()
+
+    def set_scaled_coords(self, coords_scaling, scaled_coords):
+        """
+        Provide the result of scaled_coords for coords_scaling, e.g. from a snapshot.
+        """
+        self._scaling = coords_scaling
+        self._scaled_coords = scaled_coords
+
+    def coords_changed(self):
+        """
+        Drop the scaled coordinates, needs to be called after writing to the coords column directly.
+        """
+        self._scaling = None
+        self._scaled_coords = None
+
+    def scaled_coords(self, coords_scaling):
+        """
+        Return the node coordinates scaled like Node.coord_scaling does and rounded to 5 digits.
+        The result is computed in one pass over all nodes and kept until the coordinates
+            or the scaling change.
+        :param coords_scaling: ((factor, offset, minimum), (factor, offset, minimum)) for x and y
+        :return: list of coordinate tuples, indexed by the node rows
+        """
+        if self._scaling != coords_scaling:
+            coords = self.nodes_table['coords']
+            scaled = np.empty_like(coords)
+            for k in (0, 1):
+                factor, offset, minimum = coords_scaling[k]
+                scaled[:, k] = offset + factor * (coords[:, k] - minimum)
+            # round like the built-in round does, the layout depends on the exact values
+            self._scaled_coords = [(round(x, 5), round(y, 5)) for x, y in scaled.tolist()]
+            self._scaling = coords_scaling
+        return self._scaled_coords
+
+    def node_rows(self, nodes):
+        """
+        Return the row indices of the given Node objects as an int array.
+        """
+        return np.array([node._index for node in nodes], dtype=int)
+
+    def edge_rows(self, edges):
+        """
+        Return the row indices of the given Edge objects as an int array.
+        """
+        return np.array([edge._index for edge in edges], dtype=int)
@@ -3,13 +3,22 @@
 """
 vecpy.vecpy
 ~~~~~~~~~~~
-This module contains the Vector object.
+This module contains the Vector object and its batched counterpart VectorArray.
 
 """
 __author__ = 'Jonas I Liechti'
+from math import acos, pi
+try:
+    import numpy as np
+except ImportError:
+    # only VectorArray needs numpy
+    np = None
 
 
-class Vector():
+class Vector(object):
+    # no instance dict, a Vector is just its three components
+    __slots__ = ('x', 'y', 'z')
+
     def __init__(self, *args, **kwargs):
         if args:
             if len(args) == 1 and isinstance(args[0], (list, tuple)):
@@ -42,6 +51,17 @@ class Vector():
                 self.y = end_coords[1] - start_coords[1]
             # raise error if self.x/self.y are None
 
+    @classmethod
+    def _new(cls, x, y, z):
+        """
+        Create a Vector from its components without going through the argument parsing of __init__.
+        """
+        vec = cls.__new__(cls)
+        vec.x = x
+        vec.y = y
+        vec.z = z
+        return vec
+
     @property
     def coords(self):
         return self.x, self.y, self.z
@@ -51,9 +71,13 @@ class Vector():
         return self.x, self.y, self.z
     # to do: make coords take as many dims as input
 
+    @property
+    def squared_length(self):
+        return float(self.x * self.x + self.y * self.y + self.z * self.z)
+
     @property
     def length(self):
-        return self.norm(2)
+        return float((self.x * self.x + self.y * self.y + self.z * self.z) ** 0.5)
 
     @property
     def unit(self):
@@ -61,22 +85,29 @@ class Vector():
 
     @property
     def dim(self):
-        return len(self._coords)
-
+        return 3
 
     def __iter__(self):
-        return self._coords.__iter__()
+        return iter((self.x, self.y, self.z))
+
+    def __getitem__(self, index):
+        return (self.x, self.y, self.z)[index]
 
-    # to do: implement getitem
+    def __len__(self):
+        return 3
 
     def dot(self, w):
         """ The dot product of self and other vector w.
         """
+        if isinstance(w, Vector):
+            return self.x * w.x + self.y * w.y + self.z * w.z
         return sum([xi_s * xi_w for xi_s, xi_w in zip(self, w)])
 
     def __add__(self, w):
-        if isinstance(w, (int, float)):
-            return Vector([xi + w for xi in self])
+        if isinstance(w, Vector):
+            return Vector._new(self.x + w.x, self.y + w.y, self.z + w.z)
+        elif isinstance(w, (int, float)):
+            return Vector._new(self.x + w, self.y + w, self.z + w)
         else:
             return Vector([xi_s + xi_w for xi_s, xi_w in zip(self, w)])
 
@@ -84,6 +115,8 @@ class Vector():
         return self.__add__(w)
 
     def __sub__(self, w):
+        if isinstance(w, Vector):
+            return Vector._new(self.x - w.x, self.y - w.y, self.z - w.z)
         return Vector([xi_s - xi_w for xi_s, xi_w in zip(self, w)])
 
     def __mul__(self, w):
@@ -92,7 +125,7 @@ class Vector():
             multiplies each component by other.
         """
         if isinstance(w, (float, int)):
-            return Vector([w * _xi for _xi in self])
+            return Vector._new(w * self.x, w * self.y, w * self.z)
         else:
             return self.dot(w)
 
@@ -116,10 +149,10 @@ class Vector():
         else:
             _scale = 1 / self.length
         # to do: handle error
-        return Vector([_xi * _scale for _xi in self])
+        return Vector._new(self.x * _scale, self.y * _scale, self.z * _scale)
 
     def __str__(self):
-        return str([_xi for _xi in self])
+        return str([self.x, self.y, self.z])
 
     def __format__(self, to_format):
         if any([_xi in to_format for _xi in ['x', 'y', 'z']]):
@@ -136,9 +169,11 @@ class Vector():
 
     def norm(self, p=2):
         if p == 'inf':
-            return max([abs(_xi) for _xi in self])
+            return max(abs(self.x), abs(self.y), abs(self.z))
+        elif p == 2:
+            return self.length
         else:
-            return float(sum([abs(_xi) ** p for _xi in self]) ** (1 / float(p)))
+            return float((abs(self.x) ** p + abs(self.y) ** p + abs(self.z) ** p) ** (1 / float(p)))
 
     def proj(self, w, get_scale=False):
         """
@@ -148,7 +183,7 @@ class Vector():
         :param w:
         :return:
         """
-        scale_fact = self.dot(w) / self.length ** 2
+        scale_fact = self.dot(w) / self.squared_length
         if get_scale:
             return scale_fact
         else:
@@ -158,10 +193,167 @@ class Vector():
         """
         Returns the angle (in radians by default)
         """
-        from math import acos, pi
         cos_theta = self.dot(w) / (self.length * w.length)
         theta = acos(cos_theta)
         if not degree:
             return theta
         else:
-            return theta / (2 * pi) * 360
\ No newline at end of file
+            return theta / (2 * pi) * 360
+
+
+class VectorArray(object):
+    __slots__ = ('coords', )
+
+    def __init__(self, *args):
+        """
+        Array of vectors with the API of Vector, every operation acts on all vectors at once.
+
+        Like for Vector, the vectors can be given directly or by their start and end points:
+            - VectorArray(coords) with coords of shape (N, 2) or (N, 3)
+            - VectorArray(starts, stops) with starts and stops of shape (N, 2) or (N, 3)
+        Two dimensional input gets a z component of 0. Requires numpy.
+        """
+        if np is None:
+            raise ImportError('VectorArray requires numpy')
+        if len(args) == 2:
+            coords = np.asarray(args[1], dtype=float) - np.asarray(args[0], dtype=float)
+        else:
+            coords = np.asarray(args[0], dtype=float)
+        coords = coords.reshape(-1, coords.shape[-1])
+        if coords.shape[1] == 2:
+            coords = np.concatenate([coords, np.zeros((len(coords), 1))], axis=1)
+        self.coords = coords
+
+    @classmethod
+    def _new(cls, coords):
+        vec = cls.__new__(cls)
+        vec.coords = coords
+        return vec
+
+    @property
+    def x(self):
+        return self.coords[:, 0]
+
+    @property
+    def y(self):
+        return self.coords[:, 1]
+
+    @property
+    def z(self):
+        return self.coords[:, 2]
+
+    @property
+    def squared_length(self):
+        return (self.coords * self.coords).sum(axis=1)
+
+    @property
+    def length(self):
+        return np.sqrt(self.squared_length)
+
+    @property
+    def unit(self):
+        return self ^ 0
+
+    @property
+    def dim(self):
+        return 3
+
+    def __len__(self):
+        return len(self.coords)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return Vector._new(*self.coords[index].tolist())
+        return VectorArray._new(self.coords[index])
+
+    def __iter__(self):
+        for row in self.coords.tolist():
+            yield Vector._new(*row)
+
+    def _other(self, w):
+        """
+        Coordinates of w as an array that broadcasts against self.coords.
+        """
+        if isinstance(w, VectorArray):
+            return w.coords
+        if isinstance(w, Vector):
+            return np.array(w.coords, dtype=float)
+        return VectorArray(w).coords
+
+    def dot(self, w):
+        """
+        Row wise dot product with w (a VectorArray, a Vector or coordinates)
+        """
+        return (self.coords * self._other(w)).sum(axis=1)
+
+    def __add__(self, w):
+        if isinstance(w, (int, float)):
+            return VectorArray._new(self.coords + w)
+        return VectorArray._new(self.coords + self._other(w))
+
+    def __radd__(self, w):
+        return self.__add__(w)
+
+    def __sub__(self, w):
+        return VectorArray._new(self.coords - self._other(w))
+
+    def __mul__(self, w):
+        """
+        Scale the vectors by a number or an array of numbers (one per vector),
+            or compute the row wise dot product with vectors.
+        """
+        if isinstance(w, (int, float)):
+            return VectorArray._new(w * self.coords)
+        if isinstance(w, np.ndarray) and w.ndim == 1 and len(w) == len(self.coords):
+            return VectorArray._new(w[:, None] * self.coords)
+        return self.dot(w)
+
+    def __rmul__(self, w):
+        return self.__mul__(w)
+
+    def __xor__(self, fct):
+        """
+        Returns a new rescaled VectorArray, fct is a number or an array with one factor per vector.
+        Like for Vector, a factor of 0 gives the unit vector.
+        """
+        fct = np.broadcast_to(np.asarray(fct, dtype=float), (len(self.coords), ))
+        with np.errstate(divide='ignore', invalid='ignore'):
+            _scale = np.where(fct != 0, fct, 1 / self.length)
+        return VectorArray._new(self.coords * _scale[:, None])
+
+    def __str__(self):
+        return str(self.coords.tolist())
+
+    def norm(self, p=2):
+        if p == 'inf':
+            return np.abs(self.coords).max(axis=1)
+        elif p == 2:
+            return self.length
+        else:
+            return (np.abs(self.coords) ** p).sum(axis=1) ** (1 / float(p))
+
+    def proj(self, w, get_scale=False):
+        """
+        Project the vectors w onto the vectors of self, row by row.
+        :param w: VectorArray, Vector or coordinates
+        :param get_scale: if True, the array of rescaling factors is returned instead
+        :return:
+        """
+        with np.errstate(divide='ignore', invalid='ignore'):
+            scale_fact = self.dot(w) / self.squared_length
+        if get_scale:
+            return scale_fact
+        else:
+            return self ^ scale_fact
+
+    def angle(self, w, degree=False):
+        """
+        Returns the angles (in radians by default) between the vectors of self and w
+        """
+        other = w if isinstance(w, VectorArray) else VectorArray._new(np.atleast_2d(self._other(w)))
+        cos_theta = self.dot(other) / (self.length * other.length)
+        theta = np.arccos(np.clip(cos_theta, -1., 1.))
+        if not degree:
+            return theta
+        else:
+            return theta / (2 * pi) * 360
@@ -0,0 +1,134 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Streaming readers for whitespace separated network, attack and solution files
+"""
+
+
+def _records(path, comment='#', delimiter=None):
+    """
+    Yield the fields of each line of a file, skipping empty lines and comments.
+    """
+    with open(path) as fd:
+        for line in fd:
+            line = line.split(comment, 1)[0].strip()
+            if line:
+                yield line.split(delimiter)
+
+
+def _invalid(kind, path, fields):
+    return ValueError('Invalid line in {} file {}: {}'.format(kind, path, ' '.join(fields)))
+
+
+def read_nodes(path, columns=('ID', 'x', 'y', 'need', 'penalty'), id_type=int, **kwargs):
+    """
+    Read a node file line by line, yielding a dict per node that can be passed to TVis.
+
+    :param path: path to the file
+    :param columns: name of the value in each column, 'x' and 'y' are combined to 'coords'.
+        Lines may have fewer columns than given, the missing values are not set.
+    :param id_type: type the node ids are converted to
+    :param kwargs:
+        - comment: lines are ignored from this character on (default: '#')
+        - delimiter: separator of the columns (default: whitespace)
+    :return: generator of dicts
+    :raises ValueError: on a line that can not be read, e.g. with an x but no y value
+    """
+    for fields in _records(path, **kwargs):
+        values = dict(zip(columns, fields))
+        try:
+            node = {'ID': id_type(values.pop('ID'))}
+            if 'x' in values:
+                node['coords'] = (float(values.pop('x')), float(values.pop('y')))
+            for name, value in values.items():
+                node[name] = float(value)
+        except (KeyError, ValueError):
+            raise _invalid('node', path, fields)
+        yield node
+
+
+def read_edges(path, columns=('ID', 'start_id', 'stop_id', 'capacity'), id_type=int, **kwargs):
+    """
+    Read an edge file line by line, yielding a dict per edge that can be passed to TVis.
+
+    :param path: path to the file
+    :param columns: name of the value in each column
+    :param id_type: type the edge and node ids are converted to
+    :param kwargs: see read_nodes
+    :return: generator of dicts
+    :raises ValueError: on a line that can not be read, e.g. without start or stop node
+    """
+    for fields in _records(path, **kwargs):
+        edge = {}
+        try:
+            for name, value in zip(columns, fields):
+                edge[name] = id_type(value) if name in ('ID', 'start_id', 'stop_id') else float(value)
+        except ValueError:
+            raise _invalid('edge', path, fields)
+        if 'start_id' not in edge or 'stop_id' not in edge:
+            raise _invalid('edge', path, fields)
+        yield edge
+
+
+def _edge_id(fields, id_type):
+    """
+    An edge is given either by its id or by the ids of its start and stop node.
+    """
+    if len(fields) == 1:
+        return id_type(fields[0])
+    if len(fields) == 2:
+        return id_type(fields[0]), id_type(fields[1])
+    raise ValueError('An edge is given by one or two ids, not {}'.format(len(fields)))
+
+
+def read_attack(path, id_type=int, **kwargs):
+    """
+    Read an attack file with lines 'node <id>' and 'edge <id>' or 'edge <start_id> <stop_id>'.
+
+    :param path: path to the file
+    :param id_type: type the ids are converted to
+    :param kwargs: see read_nodes
+    :return: tuple (attacked_nodes, attacked_edges) as expected by TVis.load_attack
+    :raises ValueError: on a line that can not be read
+    """
+    attacked_nodes = []
+    attacked_edges = []
+    for fields in _records(path, **kwargs):
+        try:
+            if fields[0] == 'node' and len(fields) == 2:
+                attacked_nodes.append(id_type(fields[1]))
+                continue
+            if fields[0] == 'edge':
+                attacked_edges.append(_edge_id(fields[1:], id_type))
+                continue
+        except ValueError:
+            pass
+        raise _invalid('attack', path, fields)
+    return attacked_nodes, attacked_edges
+
+
+def read_solution(path, id_type=int, **kwargs):
+    """
+    Read a solution file with the lines
+        '<before|after> node <id> <uncovered need> <total costs>' and
+        '<before|after> edge <id> <flux>' or '<before|after> edge <start_id> <stop_id> <flux>'.
+
+    :param path: path to the file
+    :param id_type: type the ids are converted to
+    :param kwargs: see read_nodes
+    :return: tuple (before_config, after_config) of configurations as expected by TVis.load_config
+    :raises ValueError: on a line that can not be read, e.g. an edge without flux
+    """
+    configs = {'before': ({}, {}), 'after': ({}, {})}
+    for fields in _records(path, **kwargs):
+        config = configs.get(fields[0], None)
+        try:
+            if config is not None and fields[1:2] == ['node'] and len(fields) == 5:
+                config[0][id_type(fields[2])] = (float(fields[3]), float(fields[4]))
+                continue
+            if config is not None and fields[1:2] == ['edge']:
+                config[1][_edge_id(fields[2:-1], id_type)] = float(fields[-1])
+                continue
+        except ValueError:
+            pass
+        raise _invalid('solution', path, fields)
+    return configs['before'], configs['after']
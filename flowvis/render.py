@@ -0,0 +1,112 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Array based drawing of the node circles and edge arrows
+"""
+import numpy as np
+from matplotlib import rcParams
+from matplotlib.collections import EllipseCollection, PolyCollection
+from matplotlib.colors import to_rgba
+
+
+def _style(kwargs):
+    """
+    Resolve the face color, edge color, line width and line style of a patch
+        from the keyword arguments that would be passed to it.
+    """
+    alpha = kwargs.get('alpha', None)
+    if kwargs.get('color', None) is not None:
+        # like for patches, color overrides facecolor and edgecolor
+        fc = ec = kwargs['color']
+    else:
+        fc = kwargs.get('facecolor', kwargs.get('fc', rcParams['patch.facecolor']))
+        ec = kwargs.get('edgecolor', kwargs.get('ec', rcParams['patch.edgecolor']))
+    fc = to_rgba(fc, alpha) if kwargs.get('fill', True) else (0., 0., 0., 0.)
+    ec = to_rgba(ec, alpha)
+    lw = kwargs.get('linewidth', kwargs.get('lw', None))
+    if lw is None:
+        lw = rcParams['patch.linewidth']
+    return fc, ec, lw, kwargs.get('linestyle', kwargs.get('ls', 'solid'))
+
+
+def arrow_polygons(x, y, dx, dy, width, head_width, head_length, length_includes_head):
+    """
+    Vertices of full arrows without overhang, computed like matplotlib.patches.FancyArrow
+        does for a single arrow.
+    All arguments are arrays of the same length.
+    :return: tuple (verts, keep) with verts an array of shape (K, 8, 2) holding the arrows
+        that are drawn, i.e. the ones that do not have zero length as indicated by the boolean array keep
+    """
+    x, y, dx, dy, width, head_width, head_length = [
+        np.asarray(a, dtype=float) for a in (x, y, dx, dy, width, head_width, head_length)
+    ]
+    length_includes_head = np.asarray(length_includes_head, dtype=bool)
+    distance = np.hypot(dx, dy)
+    length = np.where(length_includes_head, distance, distance + head_length)
+    keep = length != 0
+    x, y, dx, dy, width, head_width, head_length, length, distance, length_includes_head = [
+        a[keep] for a in (x, y, dx, dy, width, head_width, head_length, length, distance, length_includes_head)
+    ]
+    zero = np.zeros_like(length)
+    # horizontal arrow pointing at (0, 0), the stem midpoints are omitted
+    coords = np.stack([
+        np.stack([zero, zero], axis=-1),
+        np.stack([-head_length, -head_width / 2.], axis=-1),
+        np.stack([-head_length, -width / 2.], axis=-1),
+        np.stack([-length, -width / 2.], axis=-1),
+        np.stack([-length, width / 2.], axis=-1),
+        np.stack([-head_length, width / 2.], axis=-1),
+        np.stack([-head_length, head_width / 2.], axis=-1),
+        np.stack([zero, zero], axis=-1),
+    ], axis=1)
+    # if the head is not included, shift up by head length
+    coords[:, :, 0] += np.where(length_includes_head, 0., head_length)[:, None]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        cx = np.where(distance != 0, dx / distance, 0.)
+        sx = np.where(distance != 0, dy / distance, 1.)
+    verts = np.empty_like(coords)
+    verts[:, :, 0] = coords[:, :, 0] * cx[:, None] - coords[:, :, 1] * sx[:, None] + (x + dx)[:, None]
+    verts[:, :, 1] = coords[:, :, 0] * sx[:, None] + coords[:, :, 1] * cx[:, None] + (y + dy)[:, None]
+    return verts, keep
+
+
+def primitive_collections(primitives, ax):
+    """
+    Build collections from the primitives created by NodeVis and EdgeVis in primitives mode.
+
+    Arrows are gathered in a single PolyCollection, circles in a single EllipseCollection.
+    Like in a PatchCollection, the zorder of the individual elements is ignored: the arrows are
+        drawn first and the circles in the order they are given.
+    :param primitives: list of tuples ('circle', coords, r, kwargs) or ('arrow', x, y, dx, dy, kwargs)
+        with kwargs the keyword arguments that would be passed to the patch
+    :param ax: the axes the collections are meant for
+    :return: list of collections, in the order they should be added to the axes
+    """
+    arrows = [p[1:] for p in primitives if p[0] == 'arrow']
+    circles = [p[1:] for p in primitives if p[0] == 'circle']
+    collections = []
+    if arrows:
+        verts, keep = arrow_polygons(*zip(*[
+            (
+                x, y, dx, dy, kw['width'], kw['head_width'], kw['head_length'],
+                kw.get('length_includes_head', False)
+            ) for x, y, dx, dy, kw in arrows
+        ]))
+        styles = [_style(arrows[k][4]) for k in np.flatnonzero(keep)]
+        collections.append(PolyCollection(
+            verts,
+            facecolors=[s[0] for s in styles], edgecolors=[s[1] for s in styles],
+            linewidths=[s[2] for s in styles], linestyles=[s[3] for s in styles],
+            zorder=1
+        ))
+    if circles:
+        styles = [_style(kw) for coords, r, kw in circles]
+        diameters = np.array([2. * r for coords, r, kw in circles], dtype=float)
+        collections.append(EllipseCollection(
+            diameters, diameters, np.zeros(len(circles)), units='xy',
+            offsets=np.array([coords for coords, r, kw in circles], dtype=float).reshape(-1, 2),
+            transOffset=ax.transData,
+            facecolors=[s[0] for s in styles], edgecolors=[s[1] for s in styles],
+            linewidths=[s[2] for s in styles], linestyles=[s[3] for s in styles],
+            zorder=1
+        ))
+    return collections
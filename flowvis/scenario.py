@@ -1,26 +1,74 @@
 __author__ = 'Jonas I Liechti'
 from visualizer import TVis
+from parsers import read_nodes, read_edges, read_attack, read_solution
+from snapshot import is_snapshot, snapshot_source
+from cache import files_key
 from matplotlib.colors import cnames
 import os
+import sys
 import errno
+import time
+from multiprocessing import Pool, cpu_count, current_process
+
+# the TVis rendered by the processes of Scenario._render_parallel
+_PARALLEL_TVIS = None
+
+
+def _can_fork():
+    """
+    Whether worker processes inherit the state of this process, which the parallel rendering needs.
+    """
+    # daemonic processes (e.g. pool workers) are not allowed to have children
+    return sys.platform != 'win32' and not current_process().daemon
+
+
+def _render_view(args):
+    """
+    Worker: draw the inherited TVis in the given state and save it.
+    :return: seconds spent
+    """
+    state, filename = args
+    started = time.time()
+    tvis = _PARALLEL_TVIS
+    # never touch the pyplot state or the figure of the parent process
+    tvis.use_pyplot = False
+    tvis.fig_1 = None
+    tvis.set_state(state)
+    tvis.create_figure()
+    tvis.save_figure(filename)
+    return time.time() - started
 
 
 class Scenario():
     def __init__(
             self, input_path,
-            node_parser,
-            edge_parser,
-            attack_parser,
-            solution_parser,
+            node_parser=None,
+            edge_parser=None,
+            attack_parser=None,
+            solution_parser=None,
             **kwargs
     ):
+        """
+        :param input_path: directory of the scenario
+        :param node_parser: function returning the nodes (dicts) of a file, a list or a generator.
+            If not provided, parsers.read_nodes is used, which streams the nodes into the network
+        :param edge_parser: same for the edges (default: parsers.read_edges)
+        :param attack_parser: function returning the attacked nodes and edges of a file (default: parsers.read_attack)
+        :param solution_parser: function returning the configurations before and after the attack
+            (default: parsers.read_solution)
+        :param kwargs:
+            - snapshot: directory of a binary snapshot of the network (see TVis.to_snapshot). If it
+                exists and was written from the current node and edge files, the network is loaded
+                from it instead of these files, otherwise it is written from them. The files are
+                recognized by a hash of their content, if they can not be read the snapshot is used
+                as it is. visualize adds the layout to it.
+        :return:
+        """
         self.path = input_path
-        self.load_nodes = node_parser
-        self.load_edges = edge_parser
-        if attack_parser:
-            self.load_attack = attack_parser
-        if solution_parser:
-            self.load_solution = solution_parser
+        self.load_nodes = node_parser or read_nodes
+        self.load_edges = edge_parser or read_edges
+        self.load_attack = attack_parser or read_attack
+        self.load_solution = solution_parser or read_solution
         self.nodes_file = kwargs.get(
             'nodes_file',
             os.path.join(
@@ -40,18 +88,29 @@ class Scenario():
         # initialize the color mapper
         self.color_mapper = {name: hex_code for name, hex_code in cnames.iteritems()}
         colors = kwargs.get('colors', None)
+        # layout_cache: a LayoutCache to share optimized layouts, e.g. between scenarios on the same network
+        # use_pyplot: set to False to render without pyplot, e.g. in batch jobs
+        # render_mode: 'arrays' to draw nodes and edges as a few array based collections
+        # instrumentation: an instrument.Instrumentation timing the stages of the TVis and of visualize
+        tvis_kwargs = {
+            k: kwargs[k] for k in ('layout_cache', 'use_pyplot', 'render_mode', 'instrumentation') if k in kwargs
+        }
         if colors:
             colors = {k: self.color_mapper.get(k, colors[k]) for k in colors}
-            self.tvis = TVis(
-                nodes=self.load_nodes(self.nodes_file),
-                edges=self.load_edges(self.edges_file),
-                colors=colors
-            )
+            tvis_kwargs['colors'] = colors
+        self.snapshot = kwargs.get('snapshot', None)
+        source = self._source() if self.snapshot else None
+        if self.snapshot and is_snapshot(self.snapshot) and source in (None, snapshot_source(self.snapshot)):
+            self.tvis = TVis.from_snapshot(self.snapshot, **tvis_kwargs)
         else:
             self.tvis = TVis(
                 nodes=self.load_nodes(self.nodes_file),
                 edges=self.load_edges(self.edges_file),
+                **tvis_kwargs
             )
+            if self.snapshot:
+                # written before any attack or configuration is loaded
+                self.tvis.to_snapshot(self.snapshot, source=source)
         self.attack_file = kwargs.get(
             'attack_file',
             os.path.join(
@@ -70,12 +129,107 @@ class Scenario():
         # initialize the configurations
         self.before_config = None
         self.after_config = None
+        # seconds spent on each output of the last call of visualize
+        self.timings = {}
+
+    def _source(self):
+        """
+        Key of the node and edge files or None if they can not be read, e.g. with parsers that ignore them.
+        """
+        try:
+            return files_key(self.nodes_file, self.edges_file)
+        except (IOError, OSError):
+            return None
+
+    @property
+    def instrumentation(self):
+        return self.tvis.instrumentation
+
+    def _render(self, restyle=False, **kwargs):
+        """
+        Draw the current state of the network.
+        :param restyle: if True, only update the figure of the previous rendering
+        :param kwargs: passed to TVis.to_visual_elements
+        :return: True
+        """
+        if restyle:
+            self.tvis.restyle()
+        else:
+            self.tvis.to_visual_elements(**kwargs)
+        return True
+
+    def _views(self, visualize_layout, visualize_attack, visualize_solution):
+        """
+        Bring the network into the state of each view in turn.
+        :return: generator of (name, save) tuples, views with save False are only rendered
+        """
+        if visualize_layout:
+            yield 'basic_layout', True
+        if not os.path.isfile(self.attack_file):
+            visualize_attack = False
+        if not os.path.isfile(self.solution_file):
+            visualize_solution = False
+        # load the attack scenario
+        if any([visualize_attack, visualize_solution]):
+            with self.instrumentation.stage('read_attack'):
+                attack = self.load_attack(self.attack_file)
+            self.tvis.load_attack(*attack)
+            if visualize_attack:
+                yield 'attack_plan', True
+            # load the solution configurations
+            with self.instrumentation.stage('read_solution'):
+                self.before_config, self.after_config = self.load_solution(self.solution_file)
+            # set the status before the attack
+            self.tvis.reset_functionality()
+            self.tvis.load_config(self.before_config)
+            # visualize scenario before attack
+            yield 'solution_before', visualize_solution
+            # load the configuration after the attack
+            self.tvis.load_attack(*attack)
+            self.tvis.load_config(self.after_config)
+            #visualize the scenario after the attack
+            yield 'solution_after', visualize_solution
+
+    def _render_parallel(self, views, output_dir, format, processes, **kwargs):
+        """
+        Compute the layout once and render the views concurrently in forked processes.
+        :param views: list of (name, state) tuples, the network is left in the state of the last one
+        :param processes: maximal number of worker processes
+        :return:
+        """
+        global _PARALLEL_TVIS
+        self.tvis.compute_layout(**kwargs)
+        # the workers inherit the network and its layout when they are forked
+        _PARALLEL_TVIS = self.tvis
+        pool = Pool(min(processes, len(views) - 1)) if len(views) > 1 else None
+        try:
+            if pool is not None:
+                pending = pool.map_async(
+                    _render_view,
+                    [(state, os.path.join(output_dir, '{}{}'.format(name, format))) for name, state in views[:-1]]
+                )
+            # the last view is drawn here, such that this figure is left in the same state as sequentially
+            name, state = views[-1]
+            started = time.time()
+            with self.instrumentation.stage(name):
+                self.tvis.set_state(state)
+                self.tvis.create_figure()
+                self.tvis.save_figure(os.path.join(output_dir, '{}{}'.format(name, format)))
+            self.timings[name] = time.time() - started
+            if pool is not None:
+                for (name, state), elapsed in zip(views[:-1], pending.get()):
+                    self.timings[name] = elapsed
+        finally:
+            _PARALLEL_TVIS = None
+            if pool is not None:
+                pool.close()
+                pool.join()
 
     def visualize(
             self, output_dir, solution_file=None, attack_file=None,
             format='.pdf',
             visualize_solution=True, visualize_attack=False,
-            visualize_layout=False, **kwargs
+            visualize_layout=False, close_figure=True, parallel=False, **kwargs
     ):
         """
         Visualizes a scenario
@@ -86,6 +240,11 @@ class Scenario():
         :param visualize_solution: Indicate whether to plot the solution
         :param visualize_attack: Indicate whether to plot just the attack scenario
         :param visualize_layout: Indicate whether to plot the basic layout of the network
+        :param close_figure: Release the figure once all files are written (default: True)
+        :param parallel: Render the outputs concurrently in forked processes, True or the maximal
+            number of processes (default: False). The layout is computed once beforehand.
+            Falls back to rendering one output after the other where processes can not be forked,
+            e.g. on Windows or within a daemonic process like a worker of batch.render_batch.
         :param kwargs: optional arguments passed to the visualization procedure.
         :return:
         """
@@ -95,56 +254,39 @@ class Scenario():
         except OSError as exception:
             if exception.errno != errno.EEXIST:
                 raise
-        if solution_file:
-            self.solution_file = solution_file
-        if attack_file:
-            self.attack_file = attack_file
-        if visualize_layout:
-            self.tvis.to_visual_elements(**kwargs)
-            self.tvis.save_figure(
-                os.path.join(
-                    output_dir,
-                    'basic_layout{}'.format(format)
-                )
-            )
-        if not os.path.isfile(self.attack_file):
-            visualize_attack = False
-        if not os.path.isfile(self.solution_file):
-            visualize_solution = False
-        # load the attack scenario
-        if any([visualize_attack, visualize_solution]):
-            self.tvis.load_attack(*self.load_attack(self.attack_file))
-            if visualize_attack:
-                self.tvis.to_visual_elements(**kwargs)
-                self.tvis.save_figure(
-                    os.path.join(
-                        output_dir,
-                        'attack_plan{}'.format(format)
-                    )
-                )
-            # load the solution configurations
-            self.before_config, self.after_config = self.load_solution(self.solution_file)
-            # set the status before the attack
-            self.tvis.reset_functionality()
-            self.tvis.load_config(self.before_config)
-            # visualize scenario before attack
-            self.tvis.to_visual_elements(**kwargs)
-            if visualize_solution:
-                self.tvis.save_figure(
-                    os.path.join(
-                        output_dir,
-                        'solution_before{}'.format(format)
-                    )
-                )
-            # load the configuration after the attack
-            self.tvis.load_attack(*self.load_attack(self.attack_file))
-            self.tvis.load_config(self.after_config)
-            #visualize the scenario after the attack
-            self.tvis.to_visual_elements(**kwargs)
-            if visualize_solution:
-                self.tvis.save_figure(
-                    os.path.join(
-                        output_dir,
-                        'solution_after{}'.format(format)
-                    )
-                )
+        # the stages run in the processes of the parallel mode are not instrumented
+        with self.instrumentation.stage('visualize'):
+            # seconds spent on each of the saved outputs
+            self.timings = {}
+            if solution_file:
+                self.solution_file = solution_file
+            if attack_file:
+                self.attack_file = attack_file
+            views = self._views(visualize_layout, visualize_attack, visualize_solution)
+            if parallel and _can_fork():
+                # keep a copy of the state of each saved view
+                states = [(name, self.tvis.get_state()) for name, save in views if save]
+                if states:
+                    processes = cpu_count() if parallel is True else parallel
+                    self._render_parallel(states, output_dir, format, processes, **kwargs)
+            else:
+                # the layout is the same for all views, later views only restyle the figure
+                rendered = False
+                for name, save in views:
+                    started = time.time()
+                    with self.instrumentation.stage(name):
+                        rendered = self._render(rendered, **kwargs)
+                        if save:
+                            self.tvis.save_figure(
+                                os.path.join(
+                                    output_dir,
+                                    '{}{}'.format(name, format)
+                                )
+                            )
+                    if save:
+                        self.timings[name] = time.time() - started
+        # keep the layout for the next run
+        if self.snapshot and self.tvis.layout is not None and self.tvis.layout[0] != self.tvis.snapshot_layout_key:
+            self.tvis.update_snapshot_layout(self.snapshot)
+        if close_figure:
+            self.tvis.close_figure()
@@ -0,0 +1,153 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Binary snapshots of a loaded network that can be memory mapped
+"""
+import os
+import errno
+import numpy as np
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+# increased whenever the layout of a snapshot changes
+SNAPSHOT_VERSION = 1
+
+
+def _save_ids(path, name, ids, meta):
+    """
+    Save integer ids as an array, any other ids go into the meta data.
+    """
+    ids_array = np.asarray(ids)
+    if ids_array.ndim == 1 and ids_array.dtype.kind in 'iu':
+        _save_array(path, '{}.npy'.format(name), ids_array)
+    else:
+        meta[name] = list(ids)
+
+
+def _load_ids(path, name, meta):
+    if name in meta:
+        return meta[name]
+    return np.load(os.path.join(path, '{}.npy'.format(name))).tolist()
+
+
+def save_snapshot(path, store, coords_scaling=None, layout=None, source=None):
+    """
+    Write the nodes and edges of a NetworkStore to the directory path.
+
+    Each column is saved as a .npy file such that it can be memory mapped when loading,
+        ids, extra keyword arguments and the layout are kept in meta.pkl.
+    :param path: directory of the snapshot, created if needed
+    :param store: the NetworkStore to save
+    :param coords_scaling: scaling of the coordinates, the normalized coordinates are saved along
+    :param layout: optional tuple (key, segments) of an optimized layout, see cache.layout_key
+    :param source: optional key of the files the network was read from, see cache.files_key
+    :return:
+    """
+    try:
+        os.makedirs(path)
+    except OSError as exception:
+        if exception.errno != errno.EEXIST:
+            raise
+    meta = {
+        'version': SNAPSHOT_VERSION,
+        'node_kwargs': store.node_kwargs,
+        'edge_kwargs': store.edge_kwargs,
+        'coords_scaling': coords_scaling,
+        'layout': layout,
+        'source': source
+    }
+    for table_name, table in (('nodes', store.nodes_table), ('edges', store.edges_table)):
+        for name in table.arrays:
+            _save_array(path, '{}_{}.npy'.format(table_name, name), table[name])
+    _save_ids(path, 'node_ids', [node._id for node in store.nodes], meta)
+    _save_ids(path, 'edge_ids', [edge._id for edge in store.edges], meta)
+    if coords_scaling is not None:
+        _save_array(path, 'scaled_coords.npy', np.array(store.scaled_coords(coords_scaling)).reshape(-1, 2))
+    # the meta data is written last, a snapshot without it is incomplete
+    _write_meta(path, meta)
+
+
+def _save_array(path, file_name, array):
+    """
+    Save an array to path/file_name. It is written to a temporary file that then replaces the
+        old one, such that arrays still memory mapped from the old file (e.g. those of a TVis
+        loaded from this snapshot) keep their content and may be the ones being saved.
+    """
+    tmp_file = os.path.join(path, '{}.{}.tmp'.format(file_name, os.getpid()))
+    with open(tmp_file, 'wb') as fd:
+        np.save(fd, array)
+    os.rename(tmp_file, os.path.join(path, file_name))
+
+
+def _write_meta(path, meta):
+    # write to a temporary file first such that no partial meta data can be read
+    tmp_file = os.path.join(path, 'meta.pkl.{}.tmp'.format(os.getpid()))
+    with open(tmp_file, 'wb') as fd:
+        pickle.dump(meta, fd, pickle.HIGHEST_PROTOCOL)
+    os.rename(tmp_file, os.path.join(path, 'meta.pkl'))
+
+
+def save_snapshot_layout(path, layout):
+    """
+    Replace the layout of an existing snapshot, the network itself is left untouched.
+    :param path: directory of the snapshot
+    :param layout: tuple (key, segments) or None
+    :return:
+    """
+    meta = _read_meta(path)
+    meta['layout'] = layout
+    _write_meta(path, meta)
+
+
+def _read_meta(path):
+    with open(os.path.join(path, 'meta.pkl'), 'rb') as fd:
+        meta = pickle.load(fd)
+    if meta.get('version') != SNAPSHOT_VERSION:
+        raise ValueError('Unsupported snapshot version in {}: {}'.format(path, meta.get('version')))
+    return meta
+
+
+def is_snapshot(path):
+    return os.path.isfile(os.path.join(path, 'meta.pkl'))
+
+
+def snapshot_source(path):
+    """
+    Return the key of the files the snapshot was written from (see save_snapshot) or None.
+    """
+    return _read_meta(path).get('source')
+
+
+def load_snapshot(path, mmap_mode='c'):
+    """
+    Read a snapshot written by save_snapshot.
+
+    :param path: directory of the snapshot
+    :param mmap_mode: passed to numpy.load. The default 'c' maps the files copy-on-write: nothing is
+        read before it is accessed and changes (e.g. load_config) are never written back.
+        Use None to read everything into memory.
+    :return: dict with the arrays of the nodes and edges ('nodes', 'edges'), the ids ('node_ids',
+        'edge_ids'), the extra keyword arguments, 'coords_scaling', 'scaled_coords', 'layout' and 'source'
+    """
+    meta = _read_meta(path)
+    snapshot = {
+        'node_kwargs': meta['node_kwargs'],
+        'edge_kwargs': meta['edge_kwargs'],
+        'coords_scaling': meta['coords_scaling'],
+        'layout': meta['layout'],
+        'source': meta.get('source'),
+        'node_ids': _load_ids(path, 'node_ids', meta),
+        'edge_ids': _load_ids(path, 'edge_ids', meta),
+        'scaled_coords': None
+    }
+    for table_name in ('nodes', 'edges'):
+        prefix = '{}_'.format(table_name)
+        snapshot[table_name] = {
+            file_name[len(prefix):-4]: np.load(os.path.join(path, file_name), mmap_mode=mmap_mode)
+            for file_name in os.listdir(path) if file_name.startswith(prefix) and file_name.endswith('.npy')
+        }
+    if meta['coords_scaling'] is not None:
+        scaled = np.load(os.path.join(path, 'scaled_coords.npy'))
+        snapshot['scaled_coords'] = [tuple(coords) for coords in scaled.tolist()]
+    return snapshot
@@ -5,12 +5,37 @@ DESC = """
 from matplotlib.patches import Circle, FancyBboxPatch, FancyArrow
 from matplotlib.transforms import Affine2D
 from packages.vecpy import Vector as Vec
+from network import NetworkStore, column_property
+import numpy as np
 
 
-class Edge():
+def _circle(primitives, coords, r, **kwargs):
+    """
+    Create a Circle patch or, if primitives is set, the tuple describing it
+        (see render.primitive_collections).
+    """
+    if primitives:
+        return 'circle', coords, r, kwargs
+    return Circle(coords, r, **kwargs)
+
+
+def _arrow(primitives, x, y, dx, dy, **kwargs):
+    """
+    Create a FancyArrow patch or, if primitives is set, the tuple describing it
+        (see render.primitive_collections).
+    """
+    if primitives:
+        return 'arrow', x, y, dx, dy, kwargs
+    return FancyArrow(x, y, dx, dy, **kwargs)
+
+
+class Edge(object):
+    # the attributes live in the NetworkStore, an Edge only references its row
+    __slots__ = ('_id', '_store', '_index', 's_node', 'e_node')
+
     def __init__(
             self, start_node, end_node, capacity=None, flux=None,
-            unitcost=None, strength=None, functional=True, ID=None, **kwargs
+            unitcost=None, strength=None, functional=True, ID=None, store=None, **kwargs
     ):
         """
 
@@ -23,20 +48,57 @@ class Edge():
         :param unitcost: cost of transport for an unit
         :param strength:
         :param functional:
+        :param store: NetworkStore holding the attributes (default: the store of start_node)
         :param kwargs:
         :return:
         """
         self._id = ID
         self.s_node = start_node
         self.e_node = end_node
-        self._s_id = self.s_node._id
-        self._e_id = self.e_node._id
-        self.capacity = capacity
-        self.flux = flux
-        self.unitcost = unitcost
-        self.strength = strength
-        self.functional = functional
-        self.kwargs = kwargs
+        self._store = store if store is not None else start_node._store
+        # the node rows are only meaningful if the nodes are in the same store
+        self._index = self._store.add_edge(
+            self,
+            start_node._index if start_node._store is self._store else -1,
+            end_node._index if end_node._store is self._store else -1,
+            capacity, flux, unitcost, strength, functional, kwargs
+        )
+
+    capacity = column_property('edges_table', 'capacity')
+    flux = column_property('edges_table', 'flux')
+    unitcost = column_property('edges_table', 'unitcost')
+    strength = column_property('edges_table', 'strength')
+    functional = column_property('edges_table', 'functional')
+
+    @property
+    def _s_id(self):
+        return self.s_node._id
+
+    @property
+    def _e_id(self):
+        return self.e_node._id
+
+    @classmethod
+    def view(cls, store, index, start_node, end_node, ID=None):
+        """
+        Create an Edge for a row that is already in the store, e.g. after loading a snapshot.
+        """
+        edge = cls.__new__(cls)
+        edge._id = ID
+        edge._store = store
+        edge._index = index
+        edge.s_node = start_node
+        edge.e_node = end_node
+        return edge
+
+    @property
+    def kwargs(self):
+        # stored on first access, such that changes to the returned dict are kept
+        return self._store.edge_kwargs.setdefault(self._index, {})
+
+    @kwargs.setter
+    def kwargs(self, kwargs):
+        self._store.edge_kwargs[self._index] = kwargs
 
     def is_this(self, ids):
         if isinstance(ids, tuple):
@@ -77,6 +139,11 @@ class EdgeVis():
         self.with_label = kwargs.get('with_label', True)
         self.visible = kwargs.get('visible', True)
         self.label_position = kwargs.get('label_position', 0.5)
+        # indices of the NodeVis objects of the start and end node
+        self.s_index = kwargs.get('s_index', None)
+        self.e_index = kwargs.get('e_index', None)
+        # return tuples describing the arrows instead of patches (see render.primitive_collections)
+        self.primitives = kwargs.get('primitives', False)
         self.kwargs = kwargs
         self.patch_collection = []
         self.super_patch_collection = []
@@ -90,17 +157,13 @@ class EdgeVis():
 
     @property
     def s_coords(self):
-        return tuple(map(
-            lambda x: round(x, 5),
-            self.edge.s_node.coord_scaling(self._coords_scaling)
-        ))
+        s_node = self.edge.s_node
+        return s_node._store.scaled_coords(self._coords_scaling)[s_node._index]
 
     @property
     def e_coords(self):
-        return tuple(map(
-            lambda x: round(x, 5),
-            self.edge.e_node.coord_scaling(self._coords_scaling)
-        ))
+        e_node = self.edge.e_node
+        return e_node._store.scaled_coords(self._coords_scaling)[e_node._index]
 
     @property
     def capacity(self):
@@ -117,6 +180,11 @@ class EdgeVis():
             self.layout_mode = True
         else:
             self.layout_mode = False
+        # the functionality might have changed since the creation
+        if self.functional:
+            self.alpha = 1
+        else:
+            self.alpha = 0.3
         self._basic_outline(colors)
         # create the edge label
         self._label(colors)
@@ -142,7 +210,8 @@ class EdgeVis():
                 #opt['shape'] = 'left'
             s_coords, e_coords = self.segments[i]
             #print s_coords, e_coords
-            base_line = FancyArrow(
+            base_line = _arrow(
+                self.primitives,
                 s_coords[0], s_coords[1], e_coords[0] - s_coords[0], e_coords[1] - s_coords[1], fill=True,
                 # to do: use fill false for non-functional or use fc and ec (face and edge color
                 ec=colors['ec'], fc=str(1 * float(colors['ec'])),
@@ -233,9 +302,13 @@ class EdgeVis():
         # to do: does not call self._update, so the labels might not be up to date
         return self.labels
 
-class Node():
+class Node(object):
+    # the attributes live in the NetworkStore, a Node only references its row
+    __slots__ = ('_id', '_store', '_index')
+
     def __init__(
-            self, ID, coords=None, need=None, coverage=None, penalty=None, strength=None, functional=True, **kwargs
+            self, ID, coords=None, need=None, coverage=None, penalty=None, strength=None, functional=True,
+            store=None, **kwargs
     ):
         """
             Creates a new node object for a transport system.
@@ -250,20 +323,55 @@ class Node():
             :type penalty: float, int
             :param functional: Indication if the node is functional or not
             :type functional: bool
+            :param store: NetworkStore holding the attributes (default: a new store for this node only)
+            :type store: NetworkStore
             :param kwargs:
             :return:
         """
         self._id = ID
-        self.coords = coords
-        self.functional = functional
-        self.need = need
-        self.coverage = coverage
-        self.penalty = penalty
-        self.strength = strength
+        self._store = store if store is not None else NetworkStore(capacity=1)
         # if one wants to get specific values from the kwargs:
         #self.pen_costs = kwargs.get('pens_costs', None)
-        self.total_costs = kwargs.get('total_costs', None)
-        self.kwargs = kwargs
+        self._index = self._store.add_node(
+            self, coords, need, coverage, penalty, strength, kwargs.get('total_costs', None), functional, kwargs
+        )
+
+    need = column_property('nodes_table', 'need')
+    coverage = column_property('nodes_table', 'coverage')
+    penalty = column_property('nodes_table', 'penalty')
+    strength = column_property('nodes_table', 'strength')
+    total_costs = column_property('nodes_table', 'total_costs')
+    functional = column_property('nodes_table', 'functional')
+
+    @property
+    def coords(self):
+        coords = self._store.nodes_table.arrays['coords'][self._index]
+        return None if coords[0] != coords[0] else (float(coords[0]), float(coords[1]))
+
+    @coords.setter
+    def coords(self, coords):
+        self._store.nodes_table.arrays['coords'][self._index] = (np.nan, np.nan) if coords is None else coords[:2]
+        self._store.coords_changed()
+
+    @classmethod
+    def view(cls, store, index, ID):
+        """
+        Create a Node for a row that is already in the store, e.g. after loading a snapshot.
+        """
+        node = cls.__new__(cls)
+        node._id = ID
+        node._store = store
+        node._index = index
+        return node
+
+    @property
+    def kwargs(self):
+        # stored on first access, such that changes to the returned dict are kept
+        return self._store.node_kwargs.setdefault(self._index, {})
+
+    @kwargs.setter
+    def kwargs(self, kwargs):
+        self._store.node_kwargs[self._index] = kwargs
 
     def is_this(self, an_id):
         return True if self._id == an_id else False
@@ -308,6 +416,8 @@ class NodeVis():
         self.label_scale = kwargs.get('label_scale', 1.)
         self.with_label = kwargs.get('with_label', False)
         self.show_id = kwargs.get('show_id', False)
+        # return tuples describing the circles instead of patches (see render.primitive_collections)
+        self.primitives = kwargs.get('primitives', False)
         self.kwargs = kwargs
         # initialize an empty patch collection
         self.patch_collection = []
@@ -332,8 +442,8 @@ class NodeVis():
         if self._coords:
             return self._coords
         else:
-            noramlized = self.node.coord_scaling(self._coords_scaling)
-            return tuple(map(lambda x: round(x, 5), noramlized))
+            # computed for all nodes at once and cached by the store
+            return self.node._store.scaled_coords(self._coords_scaling)[self.node._index]
 
     @property
     def functional(self):
@@ -375,6 +485,11 @@ class NodeVis():
             self.layout_mode = True
         else:
             self.layout_mode = False
+        # the functionality might have changed since the creation
+        if self.functional:
+            self.alpha = 1
+        else:
+            self.alpha = 0.3
         # set the type of node (user/producer)
         if self.need < 0.:
             self.role_color = colors['pc']
@@ -394,8 +509,8 @@ class NodeVis():
         self._label(colors)
 
     def _background(self, colors):
-        background_circle = Circle(
-            self.coords,
+        background_circle = _circle(
+            self.primitives, self.coords,
             self.r if self.need != 0. else self.r / self._transit_fraction,
             color=colors['bc'], zorder=1, fill=True, edgecolor='none', alpha=1
         )
@@ -409,23 +524,27 @@ class NodeVis():
             #    color=color['lc'], zorder=4, facecolor=color['lc'], fill=True, alpha=self.alpha
             #)
             if self.layout_mode:
-                border = Circle(
+                border = _circle(
+                    self.primitives,
                     self.coords, 0.99 * self.r, color=colors['lc'], zorder=3, fill=False, edgecolor=colors['lc'],
                     alpha=self.alpha, linewidth=70 * self.scale
                 )
-                role_fill = Circle(
+                role_fill = _circle(
+                    self.primitives,
                     self.coords, self.r, color=self.role_color, zorder=4, facecolor=self.role_color, fill=True,
                     alpha=0.5 * self.alpha
                 )
                 self.basic_structure = [role_fill, border]
             else:
-                border = Circle(
+                border = _circle(
+                    self.primitives,
                     self.coords, self.r, color=colors['lc'], zorder=3, fill=False, edgecolor=colors['lc'],
                     alpha=self.alpha, linewidth=0.5
                 )
                 self.basic_structure = [border, ]#center]
         else:
-            center = Circle(
+            center = _circle(
+                self.primitives,
                 self.coords, self.r / self._transit_fraction, color=colors['lc'], zorder=4, facecolor=colors['lc'],
                 fill=True, alpha=self.alpha
             )
@@ -456,18 +575,18 @@ class NodeVis():
         if r_status > self.r:
             r_status = self.r
             # indicate that the overflow is bigger (3 small circles around
-            crit1 = Circle(
-                self.coords, 1.05 * self.r, color=colors['ec'], zorder=3, fill=False,
+            crit1 = _circle(
+                self.primitives, self.coords, 1.05 * self.r, color=colors['ec'], zorder=3, fill=False,
                 alpha=0.9 * self.alpha,
                 linestyle='solid', linewidth=3
             )
-            crit2 = Circle(
-                self.coords, 1.15 * self.r, color=colors['ec'], zorder=3, fill=False,
+            crit2 = _circle(
+                self.primitives, self.coords, 1.15 * self.r, color=colors['ec'], zorder=3, fill=False,
                 alpha=0.7 * self.alpha,
                 linestyle='solid', linewidth=2
             )
-            crit3 = Circle(
-                self.coords, 1.21 * self.r, color=colors['ec'], zorder=3, fill=False,
+            crit3 = _circle(
+                self.primitives, self.coords, 1.21 * self.r, color=colors['ec'], zorder=3, fill=False,
                 alpha=0.5 * self.alpha,
                 linestyle='solid', linewidth=1
             )
@@ -476,8 +595,8 @@ class NodeVis():
             self.status.append(crit3)
         if r_status < self.r:
             # not enough to cover the need of this node
-            status_background = Circle(
-                self.coords, self.r, color=colors['ac'], zorder=3, fill=True, edgecolor='none',
+            status_background = _circle(
+                self.primitives, self.coords, self.r, color=colors['ac'], zorder=3, fill=True, edgecolor='none',
                 alpha=0.5 * self.alpha
             )
             # crit1 = Circle(
@@ -499,7 +618,8 @@ class NodeVis():
             #self.status.append(crit1)
             #self.status.append(crit2)
             #self.status.append(crit3)
-        status_circle = Circle(
+        status_circle = _circle(
+            self.primitives,
             self.coords, r_status, color=self.role_color, zorder=3, fill=True, edgecolor='none', alpha=self.alpha
         )
         self.status.append(status_circle)
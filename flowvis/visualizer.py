@@ -3,27 +3,113 @@ DESC = """
 
 """
 from matplotlib import pyplot as plt
+from matplotlib import rcParams
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from matplotlib.collections import PatchCollection
+from matplotlib.transforms import IdentityTransform
 from structure import *
+from layout import segment_point_distances, segments_in_box, PointGrid, CellIndex, LinkGraph, relax_graph
+from cache import LayoutCache, layout_key
+from labels import LabelLayer
+from network import NetworkStore
+from snapshot import save_snapshot, load_snapshot, save_snapshot_layout
+from render import primitive_collections
+from instrument import NO_INSTRUMENTATION, staged
+import os
+import numpy as np
+import gc
+
+
+def _patch_style(patch):
+    """
+    Path and properties of a patch as PatchCollection(patches, match_original=True) draws it.
+    """
+    return (
+        patch.get_transform().transform_path(patch.get_path()),
+        patch.get_facecolor() if patch.get_fill() else (0, 0, 0, 0),
+        patch.get_edgecolor(), patch.get_linestyle(), patch.get_linewidth(), patch.get_antialiased()
+    )
+
+
+class _ConvertedPatch():
+    """
+    A patch whose path is already transformed, as PatchCollection.set_paths reads it.
+    """
+    _transform = IdentityTransform()
+
+    def __init__(self, path):
+        self._path = path
+
+    def get_path(self):
+        return self._path
+
+    def get_transform(self):
+        return self._transform
+
+
+def _update_collection(collection, patches, styles=None):
+    """
+    Replace the content of a PatchCollection, keeping the properties of the patches
+        like PatchCollection(patches, match_original=True) does.
+    :param styles: dict patch -> style returned by the previous call, the patches in it are not converted again
+    :return: dict patch -> style of the given patches
+    """
+    styles = styles or {}
+    styles = {patch: styles[patch] if patch in styles else _patch_style(patch) for patch in patches}
+    converted = [styles[patch] for patch in patches]
+    # the paths are already transformed, so set_paths does not convert the patches again
+    collection.set_paths([_ConvertedPatch(style[0]) for style in converted])
+    collection.stale = True
+    collection.set_facecolor([style[1] for style in converted])
+    collection.set_edgecolor([style[2] for style in converted])
+    # reset the widths first, they would otherwise be broadcast against the new styles
+    collection.set_linewidth(0)
+    collection.set_linestyle([style[3] for style in converted])
+    collection.set_linewidth([style[4] for style in converted])
+    collection.set_antialiased([style[5] for style in converted])
+    return styles
+
+
+def _is_iterable(obj):
+    """
+    Whether obj can be read as a sequence of nodes or edges (dicts and strings can not).
+    """
+    return hasattr(obj, '__iter__') and not isinstance(obj, (dict, basestring))
 
 
 class TVis():
     def __init__(self, nodes, edges, **kwargs):
         """
-        :param nodes: a list of nodes. Each node has to be a dict that is passed to the Node class
+        :param nodes: a list of nodes. Each node has to be a dict that is passed to the Node class.
+            Any iterable works, e.g. a generator like parsers.read_nodes, the nodes are then
+            read one by one into the network store.
         :param edges: a list of edges. Each edge is a dict holding among other thins the 'start_id' and 'stop_id'
-            that are the ids of the involved nodes
+            that are the ids of the involved nodes. Like for nodes, any iterable works.
         :param kwargs:
+            - snapshot: directory of a snapshot (see to_snapshot) to load the network from,
+                nodes and edges are then ignored. Use from_snapshot for convenience.
+            - instrumentation: an instrument.Instrumentation collecting the time spent in each
+                stage and counters like the waypoints added or the patches drawn (default: None)
         :return:
         """
-        if isinstance(nodes, (list, tuple)):
-            self._load_nodes(nodes)
-        else:
-            raise AttributeError('Invalid argument for nodes_list')
-        if isinstance(edges, (list, tuple)):
-            self._load_edges(edges)
-        else:
-            raise AttributeError('Invalid argument for edges_list')
+        # timers and counters of the stages, see instrument.Instrumentation
+        self.instrumentation = kwargs.get('instrumentation', None) or NO_INSTRUMENTATION
+        # key of the layout stored in the loaded snapshot, if any
+        self.snapshot_layout_key = None
+        snapshot_layout = None
+        with self.instrumentation.stage('load'):
+            if kwargs.get('snapshot', None) is not None:
+                snapshot_layout = self._load_snapshot(kwargs['snapshot'])
+            else:
+                if _is_iterable(nodes):
+                    self._load_nodes(nodes)
+                else:
+                    raise AttributeError('Invalid argument for nodes_list')
+                if _is_iterable(edges):
+                    self._load_edges(edges)
+                else:
+                    raise AttributeError('Invalid argument for edges_list')
         # determine appropriate size of a node
         self.node_size = 0.1 / round(len(self.nodes) ** 0.5, 0)
         self.top_right_border = kwargs.get('top_right_border', 1 - 2 * self.node_size)
@@ -49,6 +135,34 @@ class TVis():
         # log is only used if self._debug_mode is set to true
         self.log = {}
         self._debug_mode = kwargs.get('debug_mode', False)
+        # optimized layouts are reused as long as nodes, edges and layout parameters do not change
+        self.layout_cache = kwargs.get('layout_cache', LayoutCache())
+        if snapshot_layout is not None and self.layout_cache is not None:
+            self.layout_cache.put(*snapshot_layout)
+        # (key, segments) of the last computed layout
+        self.layout = None
+        # how the last layout was obtained, see compute_layout
+        self.layout_info = None
+        self.fig_1 = None
+        self.ax_1 = None
+        self.label_options = {}
+        # without pyplot the figure is drawn on an Agg canvas, it can be saved but not shown
+        self.use_pyplot = kwargs.get('use_pyplot', True)
+        # 'patches': one Patch per circle and arrow, 'arrays': circles and arrows are drawn
+        # from arrays in a few collections, which is much faster for large networks
+        self.render_mode = kwargs.get('render_mode', 'patches')
+        if self.render_mode not in ('patches', 'arrays'):
+            raise AttributeError('Invalid render_mode: {}'.format(self.render_mode))
+        self.collections = []
+        # elements of the edge and node visualisations as last drawn, see _collect_visual_elements
+        self._visual_elements = None
+        self._visual_colors = None
+        # region to draw in the original coordinates, see set_viewport
+        self.viewport = None
+        # grids over the drawn nodes and edges, built for the first viewport of a layout
+        self._spatial_index = None
+        # rows of the edges and nodes that are drawn
+        self._visible_rows = None
 
     def _scaling(self):
         """
@@ -59,11 +173,10 @@ class TVis():
         :return:
         """
         # get max and min of coordinates
-        self.x_max = max(map(lambda x: x.coords[0], self.nodes))
-        self.x_min = min(map(lambda x: x.coords[0], self.nodes))
+        coords = self.store.nodes_table['coords']
+        self.x_max, self.y_max = map(float, coords.max(axis=0))
+        self.x_min, self.y_min = map(float, coords.min(axis=0))
         self.x_diff = float(self.x_max - self.x_min)
-        self.y_max = max(map(lambda x: x.coords[1], self.nodes))
-        self.y_min = min(map(lambda x: x.coords[1], self.nodes))
         self.y_diff = float(self.y_max - self.y_min)
         # compute the scaling factor to obtain relative coordinates
         self.coords_scaling = (
@@ -78,40 +191,145 @@ class TVis():
                 self.y_min
             )
         )
+        # normalize all coordinates at once, the NodeVis and EdgeVis objects read them from the store
+        self.store.scaled_coords(self.coords_scaling)
 
     def _load_nodes(self, nodes_list):
         """
         Method to import the network structure from a file
 
-        :param nodes_list:
-        :type nodes_list: list
+        :param nodes_list: iterable of dicts
         :return:
         """
-        self.nodes = []
-        print nodes_list
+        # the attributes of all nodes and edges are kept in columns, see network.NetworkStore
+        self.store = NetworkStore(capacity=len(nodes_list) if hasattr(nodes_list, '__len__') else 16)
+        self.nodes = self.store.nodes
+        # id -> Node, rebuilt together with the node list
+        self._node_index = {}
         for a_node in nodes_list:
-            self.nodes.append(
-                Node(
-                    **a_node
-                )
-            )
+            self.add_node(**a_node)
 
     def _load_edges(self, edges_list):
-        self.edges = []
+        self.edges = self.store.edges
+        # id -> Edge and (start_id, stop_id) -> Edge, rebuilt together with the edge list
+        self._edge_index = {}
+        self._edge_endpoint_index = {}
         for an_edge in edges_list:
             start_node = self.get_node(an_edge.pop('start_id'))
             stop_node = self.get_node(an_edge.pop('stop_id'))
-            self.edges.append(
+            self._append_edge(
                 Edge(
-                    start_node, stop_node,
+                    start_node, stop_node, store=self.store,
                     **an_edge
                 )
             )
 
+    @classmethod
+    def from_snapshot(cls, path, **kwargs):
+        """
+        Create a TVis from a snapshot written by to_snapshot.
+        The columns of the network are memory mapped, so nothing is parsed and only what is
+            accessed is read. A layout stored in the snapshot is put into the layout cache, such that
+            compute_layout with the same parameters does not optimize again.
+        :param path: directory of the snapshot
+        :param kwargs: see __init__
+        :return: TVis
+        """
+        kwargs['snapshot'] = path
+        return cls(None, None, **kwargs)
+
+    def to_snapshot(self, path, with_layout=True, source=None):
+        """
+        Write the network in its current state to a binary snapshot that can be loaded with from_snapshot.
+        :param path: directory of the snapshot
+        :param with_layout: include the last computed layout (default: True)
+        :param source: key of the input files the network was read from (see cache.files_key), such
+            that a snapshot of outdated files can be recognized, see snapshot.snapshot_source
+        :return:
+        """
+        save_snapshot(path, self.store, self.coords_scaling, self.layout if with_layout else None, source)
+        self.snapshot_layout_key = self.layout[0] if with_layout and self.layout is not None else None
+
+    def update_snapshot_layout(self, path):
+        """
+        Store the last computed layout in an existing snapshot of this network. Unlike to_snapshot,
+            this does not write the current state (configuration, attack) of the network.
+        :param path: directory of the snapshot
+        :return:
+        """
+        save_snapshot_layout(path, self.layout)
+        self.snapshot_layout_key = self.layout[0] if self.layout is not None else None
+
+    def _load_snapshot(self, path):
+        """
+        Load the network from a snapshot.
+        :return: the (key, segments) of the layout in the snapshot or None
+        """
+        # many new objects but no reference cycles, the collector would just slow this down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            snapshot = load_snapshot(path)
+            self.store = NetworkStore(capacity=0)
+            self.store.set_columns(
+                snapshot['nodes'], snapshot['edges'], snapshot['node_kwargs'], snapshot['edge_kwargs']
+            )
+            if snapshot['scaled_coords'] is not None:
+                # used as long as the scaling computed by _scaling is the same
+                self.store.set_scaled_coords(snapshot['coords_scaling'], snapshot['scaled_coords'])
+            node_ids = snapshot['node_ids']
+            edge_ids = snapshot['edge_ids']
+            starts = self.store.edges_table['start'].tolist()
+            stops = self.store.edges_table['stop'].tolist()
+            self.nodes = self.store.nodes
+            self.edges = self.store.edges
+            self.nodes.extend([Node.view(self.store, k, an_id) for k, an_id in enumerate(node_ids)])
+            self.edges.extend([
+                Edge.view(self.store, k, self.nodes[starts[k]], self.nodes[stops[k]], an_id)
+                for k, an_id in enumerate(edge_ids)
+            ])
+            # keep the first occurrence of an id, as a linear scan would
+            self._node_index = dict(zip(node_ids[::-1], self.nodes[::-1]))
+            self._edge_index = dict(zip(edge_ids[::-1], self.edges[::-1]))
+            endpoint_ids = zip([node_ids[k] for k in starts], [node_ids[k] for k in stops])
+            self._edge_endpoint_index = dict(zip(endpoint_ids[::-1], self.edges[::-1]))
+        finally:
+            if gc_enabled:
+                gc.enable()
+        if snapshot['layout'] is not None:
+            self.snapshot_layout_key = snapshot['layout'][0]
+        return snapshot['layout']
+
+    def _append_edge(self, edge):
+        # the edge list is the one of the store, the edge is already in it
+        # keep the first occurrence, as a linear scan would
+        self._edge_index.setdefault(edge._id, edge)
+        self._edge_endpoint_index.setdefault((edge._s_id, edge._e_id), edge)
+
+    def add_node(self, **kwargs):
+        """
+        Add a single node to the network, keeping the lookup index up to date.
+        :param kwargs: arguments passed to the Node class
+        :return: the new Node
+        """
+        node = Node(store=self.store, **kwargs)
+        self._node_index.setdefault(node._id, node)
+        return node
+
+    def add_edge(self, start_id, stop_id, **kwargs):
+        """
+        Add a single edge between two existing nodes, keeping the lookup indexes up to date.
+        :param start_id: id of the node the edge starts at
+        :param stop_id: id of the node the edge ends at
+        :param kwargs: arguments passed to the Edge class
+        :return: the new Edge
+        """
+        edge = Edge(self.get_node(start_id), self.get_node(stop_id), store=self.store, **kwargs)
+        self._append_edge(edge)
+        return edge
+
     def get_node(self, an_id):
-        for node in self.nodes:
-            if node.is_this(an_id):
-                return node
+        return self._node_index.get(an_id)
 
     def get_edge(self, ids):
         """
@@ -120,10 +338,11 @@ class TVis():
         :param ids:
         :return:
         """
-        for edge in self.edges:
-            if edge.is_this(ids):
-                return edge
+        if isinstance(ids, tuple):
+            return self._edge_endpoint_index.get(ids)
+        return self._edge_index.get(ids)
 
+    @staged('load_attack')
     def load_attack(self, attacked_nodes, attacked_edges):
         """
 
@@ -132,7 +351,6 @@ class TVis():
         :return:
         """
         unf_nodes = [self.get_node(an_id) for an_id in attacked_nodes]
-        print unf_nodes
         #filter(lambda x: x._id in attacked_nodes, self.nodes)
         unf_edges = [self.get_edge(an_id) for an_id in attacked_edges]
         #unf_edges = []
@@ -140,46 +358,87 @@ class TVis():
         #    for a_edge in attacked_edges:
         #        if edge._s_id in a_edge and edge._e_id in a_edge:
         #            unf_edges.append(edge)
-        for node in unf_nodes:
-            node.functional = False
-        for edge in unf_edges:
-            edge.functional = False
+        self.store.update_column('nodes_table', 'functional', False, self.store.node_rows(unf_nodes))
+        self.store.update_column('edges_table', 'functional', False, self.store.edge_rows(unf_edges))
 
     def reset_functionality(self):
         """
         Resets all nodes as edges to functional state.
         :return:
         """
-        for node in self.nodes:
-            node.functional = True
-        for edge in self.edges:
-            edge.functional = True
+        self.store.update_column('nodes_table', 'functional', True)
+        self.store.update_column('edges_table', 'functional', True)
 
-    def load_config(self, configuration):
+    @staged('load_config')
+    def load_config(self, configuration, reset=True):
         """
         Update the visual elements to the set state.
 
+        Only the nodes and edges whose values change are written, they are recorded in
+            store.dirty_nodes and store.dirty_edges such that restyle only redraws them.
         :param configuration: List containing two dict, one for the nodes and ond for the edges
+        :param reset: if True, the nodes and edges not in the configuration are set to full
+            coverage, no total costs and no flux. If False, they keep their values, so a
+            configuration can hold just the changes to the previous one.
         :return:
         """
-        # set default total coverage, no total costs
-        for node in self.nodes:
-            node.coverage = node.need
-            node.total_costs = None
-        # load the configuration
-        for node_id in configuration[0]:
-            node = self.get_node(node_id)
-            node.coverage = node.need - configuration[0][node_id][0]
-            node.total_costs = configuration[0][node_id][1]
-        # set default no flux
-        for edge in self.edges:
-            edge.flux = 0.
-        # load the configuration
-        for edge_id in configuration[1]:
-            edge = self.get_edge(edge_id)
-            edge.flux = configuration[1][edge_id]
+        nodes = self.store.nodes_table
+        node_ids = list(configuration[0])
+        rows = self.store.node_rows([self.get_node(node_id) for node_id in node_ids])
+        # (uncovered need, total costs) per node, None becomes NaN
+        values = np.array(
+            [(configuration[0][node_id][0], configuration[0][node_id][1]) for node_id in node_ids], dtype=float
+        ).reshape(-1, 2)
+        coverage = nodes['need'][rows] - values[:, 0]
+        total_costs = values[:, 1]
+        if reset:
+            # set default total coverage, no total costs
+            all_coverage = nodes['need'].copy()
+            all_coverage[rows] = coverage
+            all_total_costs = np.full(nodes.size, np.nan)
+            all_total_costs[rows] = total_costs
+            self.store.update_column('nodes_table', 'coverage', all_coverage)
+            self.store.update_column('nodes_table', 'total_costs', all_total_costs)
+        else:
+            self.store.update_column('nodes_table', 'coverage', coverage, rows)
+            self.store.update_column('nodes_table', 'total_costs', total_costs, rows)
+        edge_ids = list(configuration[1])
+        rows = self.store.edge_rows([self.get_edge(edge_id) for edge_id in edge_ids])
+        flux = np.array([configuration[1][edge_id] for edge_id in edge_ids], dtype=float)
+        if reset:
+            # set default no flux
+            all_flux = np.zeros(self.store.edges_table.size)
+            all_flux[rows] = flux
+            self.store.update_column('edges_table', 'flux', all_flux)
+        else:
+            self.store.update_column('edges_table', 'flux', flux, rows)
 
-    def to_visual_elements(
+    def get_state(self):
+        """
+        Copy of the state set by load_attack, reset_functionality and load_config.
+        :return: the state, to be passed to set_state
+        """
+        return self.store.get_state()
+
+    def set_state(self, state):
+        """
+        Bring the nodes and edges back into a state returned by get_state.
+        :param state:
+        :return:
+        """
+        self.store.set_state(state)
+
+    def to_visual_elements(self, *args, **kwargs):
+        """
+        Compute the layout (see compute_layout) and draw it on a new figure.
+        :return:
+        """
+        self.compute_layout(*args, **kwargs)
+        self.create_figure()
+        return None
+
+    @staged('compute_layout')
+    def compute_layout(
             self,
             label_scale=1, node_scale=1, edge_scale=1,
             optimize_layout=True,
@@ -189,6 +448,7 @@ class TVis():
         """
         Method to convert Node and Edge objects to NodeVis and EdgeVis objects for
             plotting and sets the positions for nodes and edges.
+        Use create_figure to draw them and restyle to update the drawing after a change of state.
         :param label_scale:
         :param node_scale:
         :param edge_scale:
@@ -199,6 +459,22 @@ class TVis():
         :param avg_dist:
         :param iterations:
         :param kwargs:
+            - sparse_layout: if True, only the nodes involved in a waypoint and the ones within
+                layout_neighbourhood of a waypoint take part in the force layout (default: False)
+            - layout_neighbourhood: distance (in normalized coordinates) up to which fixed nodes
+                around a waypoint are considered in the sparse layout (default: 4 * limit_dist)
+            - layout_engine: 'native' to relax the waypoints with layout.relax, 'networkx' to use
+                networkx.spring_layout on the whole layout graph (default: 'native')
+            - layout_tol: the native relaxation stops once no waypoint moves by more than layout_tol
+                (default: 1e-5, the precision of the rounded coordinates)
+            - layout_cooling: 'adaptive' to lower the step size of the native relaxation whenever
+                the waypoints oscillate, it then mostly stops long before iterations are used up.
+                'linear' cools down linearly like networkx.spring_layout, the waypoints move until
+                the last iteration (default: 'adaptive'). See layout.relax.
+            - min_label_px: labels with a font size below this many pixels in the output are
+                not drawn (default: 0)
+            - min_box_px: labels with a font size below this many pixels are drawn without box (default: 0)
+            - viewport: only draw a region of the network, see set_viewport (default: None)
         :return:
         """
         edge_label_scale = kwargs.get('edge_label_scale', label_scale)
@@ -214,20 +490,22 @@ class TVis():
         limit_dist_scale = kwargs.get('limit_dist_scale', 1)
         limit_dist = limit_dist_scale * 1.5 * self.node_size
         minimal_control = kwargs.get('minimal_control', True)
+        sparse_layout = kwargs.get('sparse_layout', False)
+        layout_neighbourhood = kwargs.get('layout_neighbourhood', 4 * limit_dist)
+        layout_engine = kwargs.get('layout_engine', 'native')
+        layout_tol = kwargs.get('layout_tol', 1e-5)
+        layout_cooling = kwargs.get('layout_cooling', 'adaptive')
         label_position = kwargs.get('edge_label_position', 0.5)
+        # level of detail of the labels, see labels.LabelLayer
+        self.label_options = {
+            'min_label_px': kwargs.get('min_label_px', 0),
+            'min_box_px': kwargs.get('min_box_px', 0)
+        }
+        self.set_viewport(kwargs.get('viewport', None))
         self._scaling()
-        # run through the edges
-        self.edges_visualisations = []
-        for edge in self.edges:
-            self.edges_visualisations.append(
-                EdgeVis(
-                    edge, coords_scaling=self.coords_scaling,
-                    scale=self.node_size, width_scale=0.2 * self.node_size,
-                    label_scale=edge_label_scale, edge_scale=edge_scale, node_scale=node_scale,
-                    with_label=s_e_l, visible=show_edges, label_position=label_position
-                )
-            )
         # run through the nodes
+        self._visual_elements = None
+        self._spatial_index = None
         self.nodes_visualisations = []
         for node in self.nodes:
             # create the visual object
@@ -236,264 +514,542 @@ class TVis():
                     node, r=self.node_size,
                     scale=self.node_size, label_scale=node_label_scale, node_scale=node_scale,
                     coords_scaling=self.coords_scaling,
-                    with_label=s_n_l, show_id=with_node_ids
+                    with_label=s_n_l, show_id=with_node_ids, primitives=self.render_mode == 'arrays'
+                )
+            )
+        # run through the edges
+        self.edges_visualisations = []
+        # position of each node in self.nodes, also the index of its NodeVis and checkpoint
+        node_indices = {node: k for k, node in enumerate(self.nodes)}
+        for edge in self.edges:
+            self.edges_visualisations.append(
+                EdgeVis(
+                    edge, coords_scaling=self.coords_scaling,
+                    scale=self.node_size, width_scale=0.2 * self.node_size,
+                    label_scale=edge_label_scale, edge_scale=edge_scale, node_scale=node_scale,
+                    with_label=s_e_l, visible=show_edges, label_position=label_position,
+                    s_index=node_indices[edge.s_node], e_index=node_indices[edge.e_node],
+                    primitives=self.render_mode == 'arrays'
                 )
             )
         # get a list of all points to avoid
         checkpoints = [n_vis.coords for n_vis in self.nodes_visualisations]
         # enter the optimization procedure
         if optimize_layout:
-            from packages.vecpy import Vector as Vec
-            import networkx as nx
-            # for every segment if every edge, track id of start and stop points
-            endpoint_ids = []
-            for edgevis in self.edges_visualisations:
-                endpoint_ids.append(
-                    [(checkpoints.index(edgevis.segments[0][0]), checkpoints.index(edgevis.segments[0][1]))]
+            # the layout only depends on the node positions, the edges and the layout parameters
+            key = layout_key(
+                checkpoints, self.coords_scaling,
+                [(edgevis.s_index, edgevis.e_index) for edgevis in self.edges_visualisations],
+                limit_dist, max_segments, attractor, path_attractor, avg_dist, iterations, minimal_control,
+                sparse_layout, layout_neighbourhood, layout_engine, layout_tol, layout_cooling
+            )
+            # the debug mode needs the layout graph, so always optimize
+            use_cache = self.layout_cache is not None and not self._debug_mode
+            cached_segments = self.layout_cache.get(key) if use_cache else None
+            if cached_segments is not None:
+                self.instrumentation.count('layout_cache_hits')
+                for edgevis, segments in zip(self.edges_visualisations, cached_segments):
+                    edgevis.segments = list(segments)
+                self.layout_info = {'termination': 'cached', 'cycles': 0, 'relaxations': []}
+            else:
+                self.instrumentation.count('layout_cache_misses')
+                self.layout_info = self._optimize_layout(
+                    checkpoints, limit_dist, max_segments, attractor, path_attractor, avg_dist, iterations,
+                    minimal_control, sparse_layout, layout_neighbourhood, layout_engine, layout_tol, layout_cooling
                 )
+                if use_cache:
+                    self.layout_cache.put(key, [list(edgevis.segments) for edgevis in self.edges_visualisations])
+            self.layout = (key, [list(edgevis.segments) for edgevis in self.edges_visualisations])
+        else:
+            self.layout = None
+            self.layout_info = {'termination': 'disabled', 'cycles': 0, 'relaxations': []}
 
-            # list of ids with fixed nodes
-            fixed_nodes = range(len(checkpoints))
-            nbr_fixed_nodes = len(fixed_nodes)
-            # create an network with those points (fixed nodes, no edges)
+    @staged('optimize_layout')
+    def _optimize_layout(
+            self, checkpoints, limit_dist, max_segments, attractor, path_attractor, avg_dist, iterations,
+            minimal_control, sparse_layout, layout_neighbourhood, layout_engine, layout_tol, layout_cooling
+    ):
+        """
+        Add waypoints to the segments of the EdgeVis objects such that edges do not pass
+            too close to nodes and relax the waypoints with a force layout.
+        See to_visual_elements for the parameters.
+        :param checkpoints: normalized coordinates of all nodes, in the order of self.nodes_visualisations
+        :return: dict with why the optimization stopped ('termination': 'no_waypoints' if no edge
+            passes too close to a node any more, 'max_segments' if max_segments cycles were run),
+            the number of 'cycles' and for each relaxation a tuple (iterations, reason), see layout.relax
+        """
+        # for every segment if every edge, track id of start and stop points
+        endpoint_ids = []
+        for edgevis in self.edges_visualisations:
+            endpoint_ids.append(
+                [(edgevis.s_index, edgevis.e_index)]
+            )
+
+        # list of ids with fixed nodes
+        fixed_nodes = range(len(checkpoints))
+        nbr_fixed_nodes = len(fixed_nodes)
+        # in the sparse layout fixed nodes are only added once they are close to a waypoint
+        if layout_engine == 'networkx':
+            import networkx as nx
+            # spring_layout moves all nodes of the graph, the fixed ones are held by their links
             layout_graph = nx.Graph()
-            for k in xrange(len(checkpoints)):
-                layout_graph.add_node(k, pos=checkpoints[k])
-                for j in xrange(k):
-                    layout_graph.add_edge(j, k, weight=attractor)
-            # start the optimization loop
-            cycles = 0
-            while True:
-                # for each edge track the ids of its newly added waypoints
-                waypoint_ids = []
-                for edgevis in self.edges_visualisations:
-                    segment_waypoints = [None for _ in edgevis.segments]
-                    waypoint_ids.append(segment_waypoints)
-                added_waypoints = False  # keeps track whether improvements are needed
-                #  run through the list of real edges
-                for e in xrange(len(self.edges_visualisations)):
-                    # test whether an segment of the edge comes to close to a node
-                    done = False  # indicating if we are done with a segment (are done as soon as single waypoint is added)
-                    for f in xrange(len(self.edges_visualisations[e].segments)):
-                        s_coords, e_coords = self.edges_visualisations[e].segments[f]
-                        seg_vec = Vec(s_coords, e_coords)
-                        start_vec = Vec(s_coords)
-                        for i in xrange(len(checkpoints)):
-                            checkpoint = checkpoints[i]
-                            # should not be the start or end point of the segment
-                            if i not in endpoint_ids[e][f]:
-                                start_point_vec = Vec(s_coords, checkpoint)
-                                ortho = seg_vec.proj(start_point_vec) - start_point_vec
-                                # if so, split the edge (add a waypoint)
-                                if ortho.length <= limit_dist:
-                                    # add the waypoint to the checkpoint list and the graph (as movable node)
-                                    proj_scale = round(seg_vec.proj(start_point_vec, True), 5)
-                                    limit_val = seg_vec.length * proj_scale
-                                    if 0 - limit_dist <= limit_val <= seg_vec.length + limit_dist:
-                                        # only consider case if the point was not added this round
-                                        if all([i not in new_wp_id for new_wp_id in waypoint_ids]):
-                                            # we need to add a waypoint
-                                            added_waypoints = True
-                                            new_waypoint = start_vec + proj_scale * seg_vec
-                                            checkpoints.append(
-                                                tuple(map(lambda x: round(x, 5), new_waypoint.coords[:2]))
-                                            )
-                                            new_id = len(checkpoints) - 1
-                                            old_endpoints = endpoint_ids[e][f]
-                                            if old_endpoints in layout_graph.edges():
-                                                layout_graph.remove_edge(*old_endpoints)
-                                            if old_endpoints[::-1] in layout_graph.edges():
-                                                layout_graph.remove_edge(*old_endpoints[::-1])
-                                            endpoint_ids[e][f] = (
-                                                old_endpoints[0],
-                                                new_id
-                                            )
-                                            endpoint_ids[e].insert(f + 1, (
-                                                new_id,
-                                                old_endpoints[1]
-                                            ))
-                                            #print endpoint_ids
-                                            # add it to the waypoint_ids
-                                            waypoint_ids[e][f] = new_id
-                                            #layout_graph.add_node(new_id, pos=checkpoints[-1], fixed=False)
-                                            ## add the edge between close node andd from and to the waypoint as links in the network
-                                            if i not in layout_graph.nodes() and i < nbr_fixed_nodes:
-                                                #print 'adding', i
-                                                layout_graph.add_node(i)
-                                                #print 'adding new', new_id
-                                                layout_graph.add_node(new_id)
-                                                layout_graph.add_edge(i, new_id,
-                                                                      weight=attractor)  # add virtual edge between waypoint and the node to avoid
-                                            if not minimal_control:  # add a virtual edge to each fixed node
-                                                for ci in fixed_nodes:
-                                                    if ci != i:
-                                                        weight = attractor
-                                                        layout_graph.add_edge(ci, new_id, weight=weight)
-                                            # how many segments do we have now
-                                            nbr_segs = len(endpoint_ids[e])
-                                            for segment_ids in endpoint_ids[e]:
-                                                start_id, stop_id = segment_ids
-                                                if start_id not in layout_graph.nodes():
-                                                    layout_graph.add_node(start_id)
-                                                if stop_id not in layout_graph.nodes():
-                                                    layout_graph.add_node(stop_id)
-                                                layout_graph.add_edge(start_id, stop_id, weight=path_attractor)
-                                                if start_id < nbr_fixed_nodes or stop_id < nbr_fixed_nodes:
-                                                    new_weight = path_attractor
-                                                else:
-                                                    new_weight = path_attractor
-                                                try:
-                                                    layout_graph[start_id][stop_id]['weight'] = (nbr_segs - 1) * new_weight
-                                                except KeyError:
-                                                    layout_graph[stop_id][start_id]['weight'] = (nbr_segs - 1) * new_weight
-                                            # add edges between start-waypoint and waypoint-end
-                                            #start_id = checkpoints.index(s_coords)
-                                            #end_id = checkpoints.index(e_coords)
-                                            #layout_graph.add_edge(start_id, i, weight=10)
-                                            #layout_graph.add_edge(i, end_id, weight=10)
-                                            # done for this edge
-                                            done = True
-                                            break  # leave the inner for
-                        if done:
-                            break
-                # if no waypoints needed to be added, stop the optimization
-                if not added_waypoints:
-                    break
-                # if points are added run the force layout
-                positions = {i: checkpoints[i] for i in xrange(len(checkpoints))}
-                #print 'nodes', layout_graph.nodes()
-                #print 'edges', layout_graph.edges()
-                #print fixed_nodes
-                new_positions = nx.spring_layout(
-                    layout_graph, dim=2, k=avg_dist,  # * 1 / float(len(layout_graph)) ** 0.5,
-                    scale=0.95,
-                    pos=positions, fixed=set(fixed_nodes).intersection(layout_graph.nodes()), weight='weight',
-                    iterations=iterations
+            if not sparse_layout:
+                for k in xrange(len(checkpoints)):
+                    layout_graph.add_node(k, pos=checkpoints[k])
+                    for j in xrange(k):
+                        layout_graph.add_edge(j, k, weight=attractor)
+        else:
+            # relax never moves the fixed nodes, they only need to be present as anchors
+            layout_graph = LinkGraph()
+            if not sparse_layout:
+                for k in xrange(len(checkpoints)):
+                    layout_graph.add_node(k)
+        # index the checkpoints to only test the ones close to a segment. A point can require a
+        # waypoint if it lies within limit_dist of the segment both orthogonally and along it,
+        # hence within sqrt(2) * limit_dist along each axis (plus some slack for the rounding)
+        grid = PointGrid(limit_dist, checkpoints)
+        search_margin = 2 ** 0.5 * limit_dist + 1e-4
+        # index the segments of the checked edges, such that a waypoint moving close to an edge
+        # triggers a new check of it. Coarser cells than the ones of grid keep long segments cheap
+        edge_index = CellIndex(8 * limit_dist)
+        # the edge each waypoint belongs to, indexed by id - nbr_fixed_nodes
+        waypoint_edges = []
+        # all edges are checked in the first cycle, afterwards only the ones that changed or
+        # got a moved waypoint close to them, the others are known not to need a waypoint
+        check_edges = set(xrange(len(self.edges_visualisations)))
+        # start the optimization loop
+        cycles = 0
+        relaxations = []
+        while True:
+            added_waypoints = False  # keeps track whether improvements are needed
+            done_edges = set()  # edges that got their waypoint in this cycle
+            # only checkpoints present at the start of the cycle can require a waypoint,
+            # the ones added during the cycle are the new waypoints themselves
+            points = np.array(checkpoints).reshape(-1, 2)
+            # the edges are visited in order, the ids of new waypoints follow it
+            segment_refs = [
+                (e, f) for e in sorted(check_edges)
+                for f in xrange(len(self.edges_visualisations[e].segments))
+            ]
+            self.instrumentation.count('segments_checked', len(segment_refs))
+            starts = np.array(
+                [self.edges_visualisations[e].segments[f][0] for e, f in segment_refs]
+            ).reshape(-1, 2)
+            stops = np.array(
+                [self.edges_visualisations[e].segments[f][1] for e, f in segment_refs]
+            ).reshape(-1, 2)
+            # pair each segment with the checkpoints that are close enough to require a waypoint
+            pair_rows = []
+            pair_ids = []
+            for row in xrange(len(segment_refs)):
+                candidates = grid.query_segment(starts[row], stops[row], search_margin)
+                pair_rows.extend([row] * len(candidates))
+                pair_ids.extend(candidates)
+            for e in check_edges:
+                edge_index.set(e, self.edges_visualisations[e].segments, search_margin)
+            pair_rows = np.array(pair_rows, dtype=int)
+            pair_ids = np.array(pair_ids, dtype=int)
+            # test all pairs at once
+            ortho, scales, lengths = segment_point_distances(
+                starts[pair_rows], stops[pair_rows], points[pair_ids]
+            )
+            # pairs are ordered by segment and then by checkpoint id
+            for p in np.flatnonzero(ortho <= limit_dist):
+                e, f = segment_refs[pair_rows[p]]
+                i = int(pair_ids[p])
+                # we are done with an edge as soon as a single waypoint is added
+                if e in done_edges:
+                    continue
+                # should not be the start or end point of the segment
+                if i in endpoint_ids[e][f]:
+                    continue
+                s_coords, e_coords = self.edges_visualisations[e].segments[f]
+                seg_length = float(lengths[p])
+                proj_scale = round(float(scales[p]), 5)
+                limit_val = seg_length * proj_scale
+                if not 0 - limit_dist <= limit_val <= seg_length + limit_dist:
+                    continue
+                # we need to add a waypoint
+                added_waypoints = True
+                self.instrumentation.count('waypoints_added')
+                new_waypoint = (
+                    s_coords[0] + proj_scale * (e_coords[0] - s_coords[0]),
+                    s_coords[1] + proj_scale * (e_coords[1] - s_coords[1])
                 )
-                for _id in range(nbr_fixed_nodes, len(checkpoints)):
-                    checkpoints[_id] = tuple(map(lambda x: round(x, 5), list(new_positions[_id])))
-                if self._debug_mode:
-                    self.log['positions'] = {_id: checkpoints[_id] for _id in layout_graph.nodes()}
-                    self.log['layout_network'] = layout_graph
-                # update the segments for each edgevis
-                while True:
-                    rerun = False
-                    for e in xrange(len(self.edges_visualisations)):
-                        for f in xrange(len(self.edges_visualisations[e].segments)):
-                            #print endpoint_ids[e][f], nbr_fixed_nodes
-                            if any([_id >= nbr_fixed_nodes for _id in endpoint_ids[e][f]]):
-                                # if this for loop is entered then there are waypoints to be added
-                                waypoint_id = waypoint_ids[e][f]
-                                #print 'new_wp', waypoint_id
-                                old_s, old_e = self.edges_visualisations[e].segments[f]
-                                # update the coordinates of existing mobile elements
-                                if endpoint_ids[e][f][0] >= nbr_fixed_nodes and endpoint_ids[e][f][0] != waypoint_id:
-                                    old_s = checkpoints[endpoint_ids[e][f][0]]
-                                if endpoint_ids[e][f][1] >= nbr_fixed_nodes and endpoint_ids[e][f][1] != waypoint_id:
-                                    old_e = checkpoints[endpoint_ids[e][f][1]]
-                                self.edges_visualisations[e].segments[f] = (old_s, old_e)
-                                # if a new mobile segment is added, also update
-                                if waypoint_id is not None:
-                                    self.edges_visualisations[e].segments[f] = (
-                                        old_s,
-                                        checkpoints[waypoint_id]
-                                    )
-                                    self.edges_visualisations[e].segments.insert(
-                                        f + 1, (
-                                            checkpoints[waypoint_id],
-                                            old_e
-                                        )
-                                    )
-                                    waypoint_ids[e][f] = None
-                                    waypoint_ids[e].insert(f + 1, None)
-                                    rerun = True
-                                    break
-                        if rerun:
-                            break
-                    if not rerun:
-                        break
-                #   continue in the loop
-                #print checkpoints
-                cycles += 1
-                if cycles == max_segments:
-                    break
-        self.create_figure()
-        return None
+                checkpoints.append(
+                    tuple(map(lambda x: round(x, 5), new_waypoint))
+                )
+                new_id = len(checkpoints) - 1
+                grid.add(new_id, checkpoints[new_id])
+                waypoint_edges.append(e)
+                old_endpoints = endpoint_ids[e][f]
+                if layout_graph.has_edge(*old_endpoints):
+                    layout_graph.remove_edge(*old_endpoints)
+                if layout_graph.has_edge(*old_endpoints[::-1]):
+                    layout_graph.remove_edge(*old_endpoints[::-1])
+                endpoint_ids[e][f] = (
+                    old_endpoints[0],
+                    new_id
+                )
+                endpoint_ids[e].insert(f + 1, (
+                    new_id,
+                    old_endpoints[1]
+                ))
+                #print endpoint_ids
+                #layout_graph.add_node(new_id, pos=checkpoints[-1], fixed=False)
+                ## add the edge between close node andd from and to the waypoint as links in the network
+                if i not in layout_graph and i < nbr_fixed_nodes:
+                    #print 'adding', i
+                    layout_graph.add_node(i)
+                    #print 'adding new', new_id
+                    layout_graph.add_node(new_id)
+                    layout_graph.add_edge(i, new_id,
+                                          weight=attractor)  # add virtual edge between waypoint and the node to avoid
+                if not minimal_control:  # add a virtual edge to each fixed node
+                    for ci in fixed_nodes:
+                        if ci != i:
+                            weight = attractor
+                            layout_graph.add_edge(ci, new_id, weight=weight)
+                # how many segments do we have now
+                nbr_segs = len(endpoint_ids[e])
+                for segment_ids in endpoint_ids[e]:
+                    start_id, stop_id = segment_ids
+                    if start_id not in layout_graph:
+                        layout_graph.add_node(start_id)
+                    if stop_id not in layout_graph:
+                        layout_graph.add_node(stop_id)
+                    layout_graph.add_edge(start_id, stop_id, weight=path_attractor)
+                    if start_id < nbr_fixed_nodes or stop_id < nbr_fixed_nodes:
+                        new_weight = path_attractor
+                    else:
+                        new_weight = path_attractor
+                    try:
+                        layout_graph[start_id][stop_id]['weight'] = (nbr_segs - 1) * new_weight
+                    except KeyError:
+                        layout_graph[stop_id][start_id]['weight'] = (nbr_segs - 1) * new_weight
+                # add edges between start-waypoint and waypoint-end
+                #start_id = checkpoints.index(s_coords)
+                #end_id = checkpoints.index(e_coords)
+                #layout_graph.add_edge(start_id, i, weight=10)
+                #layout_graph.add_edge(i, end_id, weight=10)
+                # done for this edge
+                done_edges.add(e)
+            # if no waypoints needed to be added, stop the optimization
+            if not added_waypoints:
+                termination = 'no_waypoints'
+                break
+            if sparse_layout:
+                # the fixed nodes around the waypoints repel them during the relaxation
+                for _id in xrange(nbr_fixed_nodes, len(checkpoints)):
+                    for j in grid.query_point(checkpoints[_id], layout_neighbourhood):
+                        if j < nbr_fixed_nodes:
+                            layout_graph.add_node(j)
+            # if points are added run the force layout
+            positions = {i: checkpoints[i] for i in xrange(len(checkpoints))}
+            #print 'nodes', layout_graph.nodes()
+            #print 'edges', layout_graph.edges()
+            #print fixed_nodes
+            with self.instrumentation.stage('relaxation'):
+                if layout_engine == 'networkx':
+                    new_positions = nx.spring_layout(
+                        layout_graph, dim=2, k=avg_dist,  # * 1 / float(len(layout_graph)) ** 0.5,
+                        scale=0.95,
+                        pos=positions, fixed=set(fixed_nodes).intersection(layout_graph.nodes()), weight='weight',
+                        iterations=iterations
+                    )
+                    self.instrumentation.count('spring_layout_calls')
+                    self.instrumentation.count('spring_layout_iterations', iterations)
+                    relaxations.append((iterations, 'iterations'))
+                else:
+                    # only move the waypoints, the fixed nodes act as anchors
+                    new_positions, nbr_iterations, reason = relax_graph(
+                        layout_graph, checkpoints, nbr_fixed_nodes,
+                        k=avg_dist, iterations=iterations, tol=layout_tol, cooling=layout_cooling
+                    )
+                    self.instrumentation.count('relaxations')
+                    self.instrumentation.count('relaxation_iterations', nbr_iterations)
+                    if reason == 'converged':
+                        self.instrumentation.count('relaxations_converged')
+                    relaxations.append((nbr_iterations, reason))
+            # the new waypoints count as moved, they were not there when the edges were checked
+            moved = set(xrange(len(checkpoints) - len(done_edges), len(checkpoints)))
+            for _id in range(nbr_fixed_nodes, len(checkpoints)):
+                new_coords = tuple(map(lambda x: round(x, 5), list(new_positions[_id])))
+                if new_coords != checkpoints[_id]:
+                    checkpoints[_id] = new_coords
+                    grid.update(_id, new_coords)
+                    moved.add(_id)
+            if self._debug_mode:
+                self.log['positions'] = {_id: checkpoints[_id] for _id in layout_graph.nodes()}
+                self.log['layout_network'] = (
+                    layout_graph if layout_engine == 'networkx' else layout_graph.to_networkx()
+                )
+            # update the segments of the edges that got a waypoint or have a moved one, in one
+            # pass each: all points of an edge but its end nodes are waypoints
+            changed_edges = done_edges.union(waypoint_edges[_id - nbr_fixed_nodes] for _id in moved)
+            for e in changed_edges:
+                segments = self.edges_visualisations[e].segments
+                path = [segments[0][0]]
+                path.extend(checkpoints[stop_id] for start_id, stop_id in endpoint_ids[e][:-1])
+                path.append(segments[-1][1])
+                self.edges_visualisations[e].segments = zip(path[:-1], path[1:])
+            # check the changed edges again and the ones close to a moved waypoint
+            check_edges = set(changed_edges)
+            for _id in moved:
+                check_edges.update(edge_index.query_point(checkpoints[_id]))
+            #   continue in the loop
+            #print checkpoints
+            cycles += 1
+            self.instrumentation.count('optimization_cycles')
+            if cycles == max_segments:
+                termination = 'max_segments'
+                break
+        return {'termination': termination, 'cycles': cycles, 'relaxations': relaxations}
 
     def _create_figure(self, x_size=10):
-        self.fig_1 = plt.figure(figsize=(x_size, (self.x_diff / self.y_diff) * x_size))
-        self.ax_1 = plt.subplot(aspect='equal')
+        """
+        Prepare an empty figure. The figure of a previous rendering is cleared and reused.
+        :param x_size: width of the figure in inches
+        :return:
+        """
+        if self.viewport is None:
+            figsize = (x_size, (self.x_diff / self.y_diff) * x_size)
+        else:
+            x_min, y_min, x_max, y_max = self._scaled_viewport()
+            figsize = (x_size, (y_max - y_min) / (x_max - x_min) * x_size)
+        if self.fig_1 is None:
+            if self.use_pyplot:
+                self.fig_1 = plt.figure(figsize=figsize)
+            else:
+                # no pyplot state: the figure is only referenced by this object
+                self.fig_1 = Figure(figsize=figsize)
+                FigureCanvasAgg(self.fig_1)
+        else:
+            self._clear_figure()
+            self.fig_1.set_size_inches(*figsize)
+        self.ax_1 = self.fig_1.add_subplot(111, aspect='equal')
         self.ax_1.axis('off')
+        if self.viewport is not None:
+            # everything is cut at the border of the axes
+            x_min, y_min, x_max, y_max = self._scaled_viewport()
+            self.ax_1.set_xlim(x_min, x_max)
+            self.ax_1.set_ylim(y_min, y_max)
 
-    def _populate_figure(self):
+    def set_viewport(self, viewport):
+        """
+        Only draw the nodes and edges in a region of the network, e.g. to zoom in on a part of a
+            large network. Only the elements within the region are created, the edges leaving it
+            are cut at its border.
+        The layout is not recomputed, call create_figure to draw the new region.
+        :param viewport: (x_min, y_min, x_max, y_max) in the original coordinates of the nodes,
+            None to draw the whole network
+        :return:
+        """
+        if viewport is not None:
+            try:
+                x_min, y_min, x_max, y_max = map(float, viewport)
+            except (TypeError, ValueError):
+                raise AttributeError('Invalid viewport: {}'.format(viewport))
+            # also rejects NaN
+            if not (x_min < x_max and y_min < y_max):
+                raise AttributeError('Invalid viewport: {}'.format(viewport))
+            viewport = (x_min, y_min, x_max, y_max)
+        self.viewport = viewport
+        self._visual_elements = None
+
+    def _scaled_viewport(self):
+        """
+        The viewport in the normalized coordinates of the NodeVis and EdgeVis objects.
+        """
+        (x_factor, x_offset, x_min), (y_factor, y_offset, y_min) = self.coords_scaling
+        return (
+            x_offset + x_factor * (self.viewport[0] - x_min), y_offset + y_factor * (self.viewport[1] - y_min),
+            x_offset + x_factor * (self.viewport[2] - x_min), y_offset + y_factor * (self.viewport[3] - y_min)
+        )
+
+    def _find_visible_rows(self):
+        """
+        Find the edges and nodes to draw.
+        With a viewport only the nodes within it (widened by the size of a node) and the
+            edges with a segment crossing it are returned, they are looked up in grids built
+            once per layout such that the cost grows with the size of the viewport rather
+            than with the size of the network.
+        :return: tuple (edge_rows, node_rows) of sorted lists
+        """
+        if self.viewport is None:
+            return range(len(self.edges_visualisations)), range(len(self.nodes_visualisations))
+        cell_size = 10 * self.node_size
+        if self._spatial_index is None:
+            node_grid = PointGrid(cell_size, [nodevis.coords for nodevis in self.nodes_visualisations])
+            edge_index = CellIndex(cell_size)
+            for e, edgevis in enumerate(self.edges_visualisations):
+                edge_index.set(e, edgevis.segments, 0)
+            self._spatial_index = (node_grid, edge_index)
+        node_grid, edge_index = self._spatial_index
+        x_min, y_min, x_max, y_max = self._scaled_viewport()
+        margin = 2 * self.node_size
+        box = (x_min - margin, y_min - margin, x_max + margin, y_max + margin)
+        node_rows = [
+            n for n in node_grid.query_box(box)
+            if box[0] <= node_grid.positions[n][0] <= box[2] and box[1] <= node_grid.positions[n][1] <= box[3]
+        ]
+        candidates = sorted(edge_index.query_box(box))
+        segment_edges = [e for e in candidates for _ in self.edges_visualisations[e].segments]
+        segments = [segment for e in candidates for segment in self.edges_visualisations[e].segments]
+        crossing = segments_in_box(
+            [segment[0] for segment in segments], [segment[1] for segment in segments], box
+        )
+        edge_rows = sorted(set(segment_edges[k] for k in np.flatnonzero(crossing)))
+        return edge_rows, node_rows
+
+    def _collect_visual_elements(self, only_dirty=False):
+        """
+        Get the patches and labels of all NodeVis and EdgeVis objects in their current state.
+        :param only_dirty: if True, only the elements of the nodes and edges that changed since
+            the last call (see NetworkStore.update_column) are created again
+        :return: tuple (patches, labels, super_patches), super_patches need to be drawn over everything else
+        """
+        if not only_dirty or self._visual_elements is None or self._visual_colors != self.colors:
+            # only the elements within the viewport are created
+            self._visible_rows = edge_rows, node_rows = self._find_visible_rows()
+            self._visual_elements = (
+                {row: self.edges_visualisations[row].get_visual_elements(self.colors) for row in edge_rows},
+                {row: self.nodes_visualisations[row].get_visual_elements(self.colors) for row in node_rows}
+            )
+            self._visual_colors = dict(self.colors)
+            self.instrumentation.count('visual_elements_created', len(edge_rows) + len(node_rows))
+        else:
+            edge_elements, node_elements = self._visual_elements
+            dirty_edges = [row for row in self.store.dirty_edges if row in edge_elements]
+            dirty_nodes = [row for row in self.store.dirty_nodes if row in node_elements]
+            for row in dirty_edges:
+                edge_elements[row] = self.edges_visualisations[row].get_visual_elements(self.colors)
+            for row in dirty_nodes:
+                node_elements[row] = self.nodes_visualisations[row].get_visual_elements(self.colors)
+            self.instrumentation.count('visual_elements_created', len(dirty_edges) + len(dirty_nodes))
+        self.store.clear_dirty()
         # collect all the patches
         patches = []
         # collect all the labels
         labels = []
         # what needs to be drawn over eveything else
         super_patches = []
-        # for the box around labels
-        bbox_props = dict(
-            boxstyle="round", fc=self.colors['bc'],
-            ec=self.colors['tc'], alpha=0.8
-        )
-        # below is going to go into visualizer function
-        # first draw the edges
-        for edgevis in self.edges_visualisations:
-            # draw the edges and label them
-            visual_els = edgevis.get_visual_elements(self.colors)
+        # first draw the edges, then the nodes
+        edge_rows, node_rows = self._visible_rows
+        for visual_els in [self._visual_elements[0][row] for row in edge_rows] + \
+                [self._visual_elements[1][row] for row in node_rows]:
+            # invisible edges have no elements
             if visual_els is not None:
                 patches.extend(visual_els[0])
-                labels.append(visual_els[1])
+                if visual_els[1] is not None:
+                    labels.extend(visual_els[1])
                 super_patches.extend(visual_els[2])
-        # now draw the nodes
-        for nodevis in self.nodes_visualisations:
-            # a node is an object of the TN class
-            visual_els = nodevis.get_visual_elements(self.colors)
-            patches.extend(visual_els[0])
-            labels.append(visual_els[1])
-            super_patches.extend(visual_els[2])
-        for single_labels in labels:
-            # print single_labels
-            if single_labels is not None:
-                for a_label in single_labels:
-                    box_fc = a_label[2].pop('box_fc', self.colors['bc'])
-                    with_box = a_label[2].pop('box', True)
-                    if not with_box:
-                        bbox_props['fc'] = 'none'
-                        bbox_props['ec'] = 'none'
-                    else:
-                        bbox_props['fc'] = box_fc
-                        bbox_props['ec'] = self.colors['tc']
-                    self.ax_1.annotate(*a_label[:2], bbox=bbox_props, **a_label[2])
+        if self.viewport is not None:
+            # the labels of edges crossing the viewport might be placed outside of it
+            x_min, y_min, x_max, y_max = self._scaled_viewport()
+            labels = [
+                a_label for a_label in labels
+                if x_min <= a_label[1][0] <= x_max and y_min <= a_label[1][1] <= y_max
+            ]
+        self.instrumentation.count('patches', len(patches))
+        self.instrumentation.count('labels', len(labels))
+        self.instrumentation.count('super_patches', len(super_patches))
+        return patches, labels, super_patches
 
+    def _populate_figure(self):
+        patches, labels, super_patches = self._collect_visual_elements()
+        self.label_layer = LabelLayer(self.ax_1, clip=self.viewport is not None, **self.label_options)
+        self.label_layer.set_labels(labels, self.colors['bc'], self.colors['tc'])
         # rotate the red bars
-        self.collection = PatchCollection(patches, match_original=True)
-        # to do: adjust the size of the annotation text (eg. one size from 0-10, 10-100, 100-1000 nodes
-        self.ax_1.add_collection(self.collection)
-        if super_patches:
-            self.super_collection = PatchCollection(super_patches, match_original=True)
-            self.ax_1.add_collection(self.super_collection)
+        if self.render_mode == 'arrays':
+            self._add_primitive_collections(patches)
+        else:
+            self.collection = PatchCollection(patches, match_original=True)
+            # to do: adjust the size of the annotation text (eg. one size from 0-10, 10-100, 100-1000 nodes
+            self.ax_1.add_collection(self.collection)
+        self.super_collection = PatchCollection(super_patches, match_original=True)
+        self.ax_1.add_collection(self.super_collection)
+        # the converted patches, filled by the first restyle
+        self._patch_styles = None
+        self._super_patch_styles = None
         if self._debug_mode:  # add the network to create the layout on top.
             import networkx as nx
             nx.draw(self.log['layout_network'], self.log['positions'], self.ax_1)
 
+    def _add_primitive_collections(self, primitives):
+        self.collections = primitive_collections(primitives, self.ax_1)
+        for collection in self.collections:
+            self.ax_1.add_collection(collection)
+
+    @staged('restyle')
+    def restyle(self):
+        """
+        Update the existing figure to the current state of the nodes and edges, e.g. after
+            load_config, load_attack or reset_functionality.
+        Neither the layout nor the figure are recomputed, so the network itself must not have
+            changed since the last call of to_visual_elements.
+        Only the elements of the nodes and edges that changed since the last drawing are created again.
+        :return:
+        """
+        patches, labels, super_patches = self._collect_visual_elements(only_dirty=True)
+        if self.render_mode == 'arrays':
+            # the collections are cheap to build, the grouping by zorder might have changed
+            for collection in self.collections:
+                collection.remove()
+            self._add_primitive_collections(patches)
+            # keep the super patches on top
+            self.super_collection.remove()
+            self.ax_1.add_collection(self.super_collection)
+        else:
+            self._patch_styles = _update_collection(self.collection, patches, self._patch_styles)
+        self._super_patch_styles = _update_collection(self.super_collection, super_patches, self._super_patch_styles)
+        self.label_layer.set_labels(labels, self.colors['bc'], self.colors['tc'])
+
     def _clear_figure(self):
         self.ax_1.cla()
         self.fig_1.clf()
 
+    def close_figure(self):
+        """
+        Release the figure, the next rendering creates a new one.
+        :return:
+        """
+        if self.fig_1 is not None and self.use_pyplot:
+            plt.close(self.fig_1)
+        self.fig_1 = None
+        self.ax_1 = None
+
+    @staged('create_figure')
     def create_figure(self):
         self._create_figure()
         self._populate_figure()
 
-    def save_figure(self, filename, path_to_folder='', format='pdf'):
+    def tight_layout(self):
+        """
+        Fit the axes into the figure. tight_layout starts from the current margins of the figure,
+            so they are reset first such that a restyled or reused figure is laid out like a new one.
+        :return:
+        """
+        self.fig_1.subplots_adjust(**{
+            name: rcParams['figure.subplot.' + name]
+            for name in ('left', 'right', 'bottom', 'top', 'wspace', 'hspace')
+        })
         self.fig_1.tight_layout()
+
+    @staged('save_figure')
+    def save_figure(self, filename, path_to_folder='', format='pdf'):
+        self.tight_layout()
         if '.' in filename:
             filename, format = filename.split('.')
         self.fig_1.savefig(
             '{}{}.{}'.format(path_to_folder, filename, format)
         )
+        if self.instrumentation.enabled:
+            self.instrumentation.count('files_written')
+            self.instrumentation.count('bytes_written', os.path.getsize('{}{}.{}'.format(path_to_folder, filename, format)))
 
     def show_figure(self):
+        if not self.use_pyplot:
+            raise AttributeError('Showing a figure requires use_pyplot=True')
         plt.show()
         self.fig_1.show()
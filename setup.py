@@ -20,7 +20,7 @@ packages = [
     'flowvis.packages'
 ]
 
-requires = ['matplotlib', ]# 'networkx']
+requires = ['matplotlib', 'numpy', ]# 'networkx']
 
 version = ''
 with open('flowvis/__init__.py', 'r') as fd:
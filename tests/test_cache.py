@@ -0,0 +1,44 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the layout cache
+"""
+import shutil
+import tempfile
+import unittest
+from flowvis.cache import LayoutCache, layout_key
+
+
+class LayoutCacheTest(unittest.TestCase):
+    def test_least_recently_used_is_evicted(self):
+        cache = LayoutCache(maxsize=2)
+        cache.put('a', 1)
+        cache.put('b', 2)
+        self.assertEqual(cache.get('a'), 1)
+        cache.put('c', 3)
+        self.assertEqual((cache.get('a'), cache.get('b'), cache.get('c')), (1, None, 3))
+        # putting an existing key refreshes it
+        cache.put('a', 4)
+        cache.put('d', 5)
+        self.assertEqual(list(cache._entries), ['a', 'd'])
+
+    def test_evicted_layouts_are_read_from_disk(self):
+        directory = tempfile.mkdtemp()
+        try:
+            cache = LayoutCache(maxsize=1, path=directory)
+            cache.put('a', [1, 2])
+            cache.put('b', [3])
+            self.assertEqual(list(cache._entries), ['b'])
+            self.assertEqual(cache.get('a'), [1, 2])
+            self.assertEqual(list(cache._entries), ['a'])
+            cache.clear()
+            self.assertEqual(LayoutCache(path=directory).get('b'), [3])
+        finally:
+            shutil.rmtree(directory)
+
+    def test_key(self):
+        self.assertEqual(layout_key((1, 2), 'x'), layout_key((1, 2), 'x'))
+        self.assertNotEqual(layout_key((1, 2), 'x'), layout_key((2, 1), 'x'))
+
+
+if __name__ == '__main__':
+    unittest.main()
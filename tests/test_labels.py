@@ -0,0 +1,38 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the label layer
+"""
+import unittest
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.figure import Figure
+from flowvis.labels import LabelLayer
+
+
+class CacheTest(unittest.TestCase):
+    def _layer(self, cache_size):
+        return LabelLayer(Figure().add_subplot(111), cache_size=cache_size)
+
+    def test_caches_are_bounded(self):
+        layer = self._layer(3)
+        for k in xrange(10):
+            layer._box(str(k), 10., 'center', 'center')
+        self.assertEqual(list(layer._extents), [('7', 10.), ('8', 10.), ('9', 10.)])
+        self.assertEqual(len(layer._boxes), 3)
+
+    def test_recently_used_entries_stay(self):
+        layer = self._layer(2)
+        first = layer._extent('a', 10.)
+        layer._extent('b', 10.)
+        self.assertEqual(layer._extent('a', 10.), first)
+        layer._extent('c', 10.)
+        self.assertEqual(list(layer._extents), [('a', 10.), ('c', 10.)])
+
+    def test_caches_belong_to_the_layer(self):
+        layer = self._layer(8)
+        layer._box('a', 10., 'left', 'bottom')
+        self.assertEqual(len(self._layer(8)._extents), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
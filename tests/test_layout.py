@@ -0,0 +1,197 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the layout helpers
+"""
+import random
+import unittest
+import numpy as np
+from flowvis.layout import relax, relax_graph, LinkGraph, PointGrid, CellIndex, segments_in_box
+
+
+def _chain():
+    """
+    Two anchors with three waypoints between them, linked in a chain.
+    """
+    pos = [(0., 0.), (1., 0.), (0.2, 0.3), (0.5, -0.2), (0.8, 0.25)]
+    links = [(2, 0), (2, 3), (3, 2), (3, 4), (4, 3), (4, 1)]
+    return pos, links, [10.] * len(links)
+
+
+def _distances(start, stop, points):
+    """
+    Brute force euclidean distances of points to the segment from start to stop.
+    """
+    start, stop, points = np.asarray(start), np.asarray(stop), np.asarray(points)
+    delta = stop - start
+    squared_length = delta.dot(delta)
+    t = np.zeros(len(points)) if squared_length == 0 else (points - start).dot(delta) / squared_length
+    closest = start + np.clip(t, 0., 1.)[:, None] * delta
+    return np.sqrt(((points - closest) ** 2).sum(axis=1))
+
+
+def _random_segments(rng, nbr, size=10.):
+    return [
+        ((rng.uniform(-size, size), rng.uniform(-size, size)), (rng.uniform(-size, size), rng.uniform(-size, size)))
+        for _ in xrange(nbr)
+    ]
+
+
+class PointGridTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(2)
+        self.points = [(rng.uniform(-10., 10.), rng.uniform(-10., 10.)) for _ in xrange(500)]
+        self.segments = _random_segments(rng, 30)
+        # including a vertical and a degenerate segment
+        self.segments += [((1., -5.), (1., 5.)), ((2., 2.), (2., 2.))]
+
+    def _check_segments(self, grid, points, margin):
+        for start, stop in self.segments:
+            found = grid.query_segment(start, stop, margin)
+            self.assertEqual(found, sorted(set(found)))
+            distances = _distances(start, stop, points)
+            close = set(np.flatnonzero(distances <= margin).tolist())
+            self.assertLessEqual(close, set(found))
+            # the points found lie in cells within margin of the segment along each axis
+            self.assertTrue((distances[found] <= np.sqrt(2) * (margin + grid.cell_size)).all())
+
+    def test_query_segment(self):
+        for cell_size, margin in ((1., 0.5), (0.3, 1.), (4., 0.)):
+            self._check_segments(PointGrid(cell_size, self.points), self.points, margin)
+
+    def test_query_box(self):
+        grid = PointGrid(1.5, self.points)
+        points = np.array(self.points)
+        for box in ((-3., -2., 4., 1.), (0., 0., 0.1, 0.1), (-20., -20., 20., 20.)):
+            found = grid.query_box(box)
+            inside = (
+                (points[:, 0] >= box[0]) & (points[:, 0] <= box[2]) & (points[:, 1] >= box[1]) & (points[:, 1] <= box[3])
+            )
+            self.assertLessEqual(set(np.flatnonzero(inside).tolist()), set(found))
+            near = (
+                (points[:, 0] >= box[0] - 1.5) & (points[:, 0] <= box[2] + 1.5) &
+                (points[:, 1] >= box[1] - 1.5) & (points[:, 1] <= box[3] + 1.5)
+            )
+            self.assertTrue(near[found].all())
+
+    def test_update(self):
+        grid = PointGrid(1., self.points)
+        rng = random.Random(3)
+        moved = list(self.points)
+        for an_id in rng.sample(xrange(len(moved)), 100):
+            moved[an_id] = (rng.uniform(-10., 10.), rng.uniform(-10., 10.))
+            grid.update(an_id, moved[an_id])
+        self._check_segments(grid, moved, 0.5)
+        self.assertEqual(
+            {cell: sorted(ids) for cell, ids in grid.cells.items()},
+            {cell: sorted(ids) for cell, ids in PointGrid(1., moved).cells.items()}
+        )
+
+
+class CellIndexTest(unittest.TestCase):
+    def setUp(self):
+        rng = random.Random(4)
+        # each key holds a polyline of two segments
+        self.keys = {}
+        for key in xrange(40):
+            points = [(rng.uniform(-10., 10.), rng.uniform(-10., 10.)) for _ in xrange(3)]
+            self.keys[key] = zip(points[:-1], points[1:])
+        rng = random.Random(5)
+        self.points = [(rng.uniform(-10., 10.), rng.uniform(-10., 10.)) for _ in xrange(300)]
+
+    def _index(self, cell_size, margin):
+        index = CellIndex(cell_size)
+        for key, segments in self.keys.items():
+            index.set(key, segments, margin)
+        return index
+
+    def _check_points(self, index, margin):
+        for coords in self.points:
+            found = index.query_point(coords)
+            for key, segments in self.keys.items():
+                distance = min(_distances(start, stop, [coords])[0] for start, stop in segments)
+                if distance <= margin:
+                    self.assertIn(key, found)
+                if key in found:
+                    self.assertLessEqual(distance, np.sqrt(2) * (margin + index.cell_size))
+
+    def test_query_point(self):
+        for cell_size, margin in ((2., 0.5), (0.5, 1.)):
+            self._check_points(self._index(cell_size, margin), margin)
+
+    def test_query_box(self):
+        index = self._index(1., 0.)
+        for box in ((-3., -2., 4., 1.), (0., 0., 0.1, 0.1)):
+            found = index.query_box(box)
+            for key, segments in self.keys.items():
+                starts, stops = zip(*segments)
+                if segments_in_box(starts, stops, box).any():
+                    self.assertIn(key, found)
+
+    def test_set_replaces(self):
+        index = self._index(1., 0.5)
+        rng = random.Random(6)
+        for key in rng.sample(sorted(self.keys), 15):
+            self.keys[key] = _random_segments(rng, 2)
+            index.set(key, self.keys[key], 0.5)
+        self._check_points(index, 0.5)
+        self.assertEqual(index.cells, self._index(1., 0.5).cells)
+
+
+class RelaxTest(unittest.TestCase):
+    def test_anchors_stay(self):
+        pos, links, weights = _chain()
+        new_pos, iterations, reason = relax(pos, 2, links, weights, k=0.1)
+        np.testing.assert_array_equal(new_pos[:2], np.array(pos[:2]))
+
+    def test_converges_before_the_budget(self):
+        pos, links, weights = _chain()
+        new_pos, iterations, reason = relax(pos, 2, links, weights, k=0.1, iterations=1000, tol=1e-5)
+        self.assertEqual(reason, 'converged')
+        self.assertLess(iterations, 1000)
+        # one more relaxation from the result hardly moves the points
+        again, _, _ = relax(new_pos, 2, links, weights, k=0.1, iterations=1000, tol=1e-5)
+        self.assertLess(np.abs(again - new_pos).max(), 1e-3)
+
+    def test_linear_cooling_uses_the_budget(self):
+        pos, links, weights = _chain()
+        _, iterations, reason = relax(pos, 2, links, weights, k=0.1, iterations=200, cooling='linear')
+        self.assertEqual((iterations, reason), (200, 'iterations'))
+
+    def test_no_movable_points(self):
+        pos, links, weights = _chain()
+        _, iterations, reason = relax(pos[:2], 2, [], [])
+        self.assertEqual((iterations, reason), (0, 'no_movable_points'))
+
+    def test_invalid_cooling(self):
+        pos, links, weights = _chain()
+        self.assertRaises(ValueError, relax, pos, 2, links, weights, cooling='fast')
+
+
+class LinkGraphTest(unittest.TestCase):
+    def test_links(self):
+        graph = LinkGraph()
+        graph.add_node(0)
+        graph.add_edge(3, 1, weight=2.)
+        graph.add_edge(1, 3, weight=5.)
+        self.assertEqual(sorted(graph.nodes()), [0, 1, 3])
+        self.assertTrue(graph.has_edge(3, 1))
+        self.assertIs(graph[1][3], graph[3][1])
+        self.assertEqual(graph[3][1]['weight'], 5.)
+        graph.remove_edge(1, 3)
+        self.assertFalse(graph.has_edge(3, 1))
+        self.assertIn(3, graph)
+
+    def test_relax_graph(self):
+        pos, links, weights = _chain()
+        graph = LinkGraph()
+        for (a, b), weight in zip(links, weights):
+            graph.add_edge(a, b, weight=weight)
+        new_positions, _, _ = relax_graph(graph, pos, 2, k=0.1)
+        expected, _, _ = relax(pos, 2, links, weights, k=0.1)
+        self.assertEqual(sorted(new_positions), [2, 3, 4])
+        for n in (2, 3, 4):
+            np.testing.assert_allclose(new_positions[n], expected[n])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the columnar NetworkStore
+"""
+import unittest
+import numpy as np
+from flowvis.network import NetworkStore
+from flowvis.structure import Node, Edge
+
+
+def _store():
+    """
+    Four nodes, the first one without a need, linked in a chain.
+    """
+    store = NetworkStore(capacity=1)
+    nodes = [
+        Node(k, coords=(float(k), 0.), need=need, store=store)
+        for k, need in enumerate((None, 2., -1., 3.))
+    ]
+    for k in xrange(3):
+        Edge(nodes[k], nodes[k + 1], capacity=5., ID=k)
+    store.clear_dirty()
+    return store
+
+
+class UpdateColumnTest(unittest.TestCase):
+    def test_only_changed_rows_are_dirty(self):
+        store = _store()
+        rows = store.update_column('nodes_table', 'need', [np.nan, 2., 4., 3.])
+        self.assertEqual(rows.tolist(), [2])
+        self.assertEqual(store.dirty_nodes, {2})
+        self.assertEqual(store.dirty_edges, set())
+        np.testing.assert_array_equal(store.nodes_table['need'], [np.nan, 2., 4., 3.])
+
+    def test_nan_equals_nan(self):
+        store = _store()
+        self.assertEqual(store.update_column('nodes_table', 'need', [np.nan, 2., -1., 3.]).tolist(), [])
+        self.assertEqual(store.update_column('edges_table', 'flux', np.nan).tolist(), [])
+        self.assertEqual((store.dirty_nodes, store.dirty_edges), (set(), set()))
+
+    def test_nan_is_a_change(self):
+        store = _store()
+        rows = store.update_column('nodes_table', 'need', [1., np.nan, -1., 3.])
+        self.assertEqual(rows.tolist(), [0, 1])
+        self.assertEqual(store.nodes[1].need, None)
+
+    def test_rows_and_a_single_value(self):
+        store = _store()
+        rows = store.update_column('edges_table', 'flux', 1., rows=np.array([0, 2]))
+        self.assertEqual(rows.tolist(), [0, 2])
+        np.testing.assert_array_equal(store.edges_table['flux'], [1., np.nan, 1.])
+        store.update_column('edges_table', 'functional', False, rows=np.array([1]))
+        self.assertEqual(store.dirty_edges, {0, 1, 2})
+        store.clear_dirty()
+        self.assertEqual(store.dirty_edges, set())
+
+    def test_attributes_mark_their_row(self):
+        store = _store()
+        store.nodes[3].coverage = 1.
+        store.edges[1].functional = False
+        self.assertEqual((store.dirty_nodes, store.dirty_edges), ({3}, {1}))
+
+    def test_state_round_trip(self):
+        store = _store()
+        state = store.get_state()
+        store.update_column('nodes_table', 'coverage', [1., 2., 3., 4.])
+        store.update_column('edges_table', 'functional', False)
+        store.clear_dirty()
+        store.set_state(state)
+        self.assertEqual((store.dirty_nodes, store.dirty_edges), ({0, 1, 2, 3}, {0, 1, 2}))
+        self.assertTrue(np.isnan(store.nodes_table['coverage']).all())
+        self.assertTrue(store.edges_table['functional'].all())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the readers of the default file formats
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from flowvis.parsers import read_nodes, read_edges, read_attack, read_solution
+
+
+class ParsersTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _file(self, content):
+        path = os.path.join(self.directory, 'input.txt')
+        with open(path, 'w') as fd:
+            fd.write(content)
+        return path
+
+    def _assert_invalid(self, reader, content):
+        path = self._file(content)
+        with self.assertRaises(ValueError) as context:
+            # the nodes and edges are only read when the generators are consumed
+            list(reader(path))
+        self.assertIn(path, str(context.exception))
+
+    def test_nodes(self):
+        path = self._file('# ID x y need penalty\n0 0.5 1 2 3\n\n1 2 3  # no need\n   \n2\n')
+        self.assertEqual(list(read_nodes(path)), [
+            {'ID': 0, 'coords': (0.5, 1.), 'need': 2., 'penalty': 3.},
+            {'ID': 1, 'coords': (2., 3.)},
+            {'ID': 2}
+        ])
+
+    def test_node_columns(self):
+        path = self._file('a;3;1.5;-2\n')
+        nodes = list(read_nodes(path, columns=('ID', 'need', 'x', 'y'), id_type=str, delimiter=';'))
+        self.assertEqual(nodes, [{'ID': 'a', 'need': 3., 'coords': (1.5, -2.)}])
+
+    def test_edges(self):
+        path = self._file('# ID start stop capacity\n0 0 1 5\n\n1 1 2 # no capacity\n')
+        self.assertEqual(list(read_edges(path)), [
+            {'ID': 0, 'start_id': 0, 'stop_id': 1, 'capacity': 5.},
+            {'ID': 1, 'start_id': 1, 'stop_id': 2}
+        ])
+
+    def test_edges_without_ids(self):
+        path = self._file('0 1 5\n')
+        self.assertEqual(
+            list(read_edges(path, columns=('start_id', 'stop_id', 'capacity'))),
+            [{'start_id': 0, 'stop_id': 1, 'capacity': 5.}]
+        )
+
+    def test_attack(self):
+        path = self._file('# attacked elements\nnode 4\n\nedge 2\nedge 0 1  # by its nodes\n')
+        self.assertEqual(read_attack(path), ([4], [2, (0, 1)]))
+
+    def test_solution(self):
+        path = self._file(
+            'before node 1 0.0 3.0\n# edges by id and by their nodes\nbefore edge 3 5.0\n\n'
+            'after edge 0 1 4.0\nafter node 2 1 2\n'
+        )
+        self.assertEqual(read_solution(path), (
+            ({1: (0., 3.)}, {3: 5.}),
+            ({2: (1., 2.)}, {(0, 1): 4.})
+        ))
+
+    def test_invalid_lines(self):
+        self._assert_invalid(read_nodes, '0 1 2\n1 0.5\n')
+        self._assert_invalid(read_nodes, 'a 1 2\n')
+        self._assert_invalid(read_nodes, '0 1 2 many\n')
+        self._assert_invalid(read_edges, '0 0 1 5\n1 2\n')
+        self._assert_invalid(read_edges, '0 0 x\n')
+        for content in ('node\n', 'node 1 2\n', 'edge\n', 'edge 0 1 2\n', 'link 1\n', 'node a\n'):
+            self._assert_invalid(read_attack, content)
+        for content in (
+                'before edge 3\n', 'before edge\n', 'before node 1 2\n', 'during node 1 2 3\n',
+                'before\n', 'after edge 0 1 2 3\n', 'after edge 3 x\n'
+        ):
+            self._assert_invalid(read_solution, content)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,100 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of Scenario.visualize
+"""
+import os
+import shutil
+import tempfile
+import unittest
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.image import imread
+import numpy as np
+from flowvis.scenario import Scenario, _can_fork
+from tests.test_visualizer import _network
+
+_VIEWS = ('basic_layout', 'attack_plan', 'solution_before', 'solution_after')
+
+
+class VisualizeTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'input'))
+        with open(os.path.join(self.directory, 'input', 'attack.txt'), 'w') as fd:
+            fd.write('node 4\nedge 0 1\n')
+        with open(os.path.join(self.directory, 'solution.txt'), 'w') as fd:
+            fd.write(
+                'before node 1 0.0 3.0\nbefore node 2 1.0 2.0\nbefore edge 0 1 4.0\nbefore edge 3 5.0\n'
+                'after node 1 2.0 4.0\nafter node 2 3.0 1.0\nafter edge 3 8.0\n'
+            )
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _visualize(self, name, parallel):
+        nodes, edges = _network()
+        scenario = Scenario(
+            self.directory, node_parser=lambda path: nodes, edge_parser=lambda path: edges,
+            use_pyplot=False, layout_cache=None
+        )
+        output_dir = os.path.join(self.directory, name)
+        # node labels without ids fail in NodeVis._label, so the ids are shown
+        scenario.visualize(
+            output_dir, format='.png', visualize_layout=True, visualize_attack=True,
+            with_node_ids=True, parallel=parallel
+        )
+        return output_dir
+
+    @unittest.skipUnless(_can_fork(), 'processes can not be forked')
+    def test_parallel_equals_sequential(self):
+        sequential = self._visualize('sequential', False)
+        parallel = self._visualize('parallel', 2)
+        for view in _VIEWS:
+            np.testing.assert_array_equal(
+                imread(os.path.join(sequential, view + '.png')), imread(os.path.join(parallel, view + '.png'))
+            )
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(self.directory, 'input'))
+        self.snapshot = os.path.join(self.directory, 'snapshot')
+        self._write('nodes.txt', '0 0. 0. 2.\n1 1. 0. -2.\n2 1. 1.\n')
+        self._write('edges.txt', '0 0 1 5.\n1 1 2 5.\n')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _write(self, name, content):
+        with open(os.path.join(self.directory, 'input', name), 'w') as fd:
+            fd.write(content)
+
+    def _scenario(self):
+        """
+        :return: tuple (node ids, whether the network was loaded from the snapshot)
+        """
+        scenario = Scenario(self.directory, snapshot=self.snapshot, use_pyplot=False, layout_cache=None)
+        loaded = isinstance(scenario.tvis.store.nodes_table.arrays['need'], np.memmap)
+        return [node._id for node in scenario.tvis.nodes], loaded
+
+    def test_snapshot_is_used(self):
+        self.assertEqual(self._scenario(), ([0, 1, 2], False))
+        self.assertEqual(self._scenario(), ([0, 1, 2], True))
+
+    def test_changed_input_files(self):
+        self._scenario()
+        self._write('nodes.txt', '0 0. 0. 2.\n1 1. 0. -2.\n2 1. 1.\n3 0. 1.\n')
+        self.assertEqual(self._scenario(), ([0, 1, 2, 3], False))
+        self.assertEqual(self._scenario(), ([0, 1, 2, 3], True))
+        self._write('edges.txt', '0 0 1 5.\n')
+        self.assertEqual(self._scenario(), ([0, 1, 2, 3], False))
+
+    def test_unreadable_input_files(self):
+        self._scenario()
+        os.remove(os.path.join(self.directory, 'input', 'edges.txt'))
+        self.assertEqual(self._scenario(), ([0, 1, 2], True))
+
+
+if __name__ == '__main__':
+    unittest.main()
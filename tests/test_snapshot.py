@@ -0,0 +1,90 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the binary snapshots
+"""
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from flowvis.snapshot import save_snapshot, load_snapshot, save_snapshot_layout, is_snapshot
+from flowvis.visualizer import TVis
+from tests.test_network import _store
+from tests.test_visualizer import _network
+
+_SCALING = ((2., 0.5, 0.), (1., 0.5, 0.))
+
+
+class SnapshotTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_round_trip(self):
+        store = _store()
+        store.nodes[2].kwargs['color'] = 'red'
+        layout = ('key', [[(0., 0.), (1., 0.)]])
+        save_snapshot(self.directory, store, _SCALING, layout)
+        self.assertTrue(is_snapshot(self.directory))
+        snapshot = load_snapshot(self.directory)
+        for name, table in (('nodes', store.nodes_table), ('edges', store.edges_table)):
+            self.assertEqual(sorted(snapshot[name]), sorted(table.arrays))
+            for column, values in snapshot[name].items():
+                np.testing.assert_array_equal(values, table[column])
+        self.assertEqual(snapshot['node_ids'], [0, 1, 2, 3])
+        self.assertEqual(snapshot['edge_ids'], [0, 1, 2])
+        self.assertEqual(snapshot['node_kwargs'], {2: {'color': 'red'}})
+        self.assertEqual(snapshot['coords_scaling'], _SCALING)
+        self.assertEqual(snapshot['scaled_coords'], store.scaled_coords(_SCALING))
+        self.assertEqual(snapshot['layout'], layout)
+
+    def test_other_ids(self):
+        store = _store()
+        for node, an_id in zip(store.nodes, ('a', 'b', 'c', 'd')):
+            node._id = an_id
+        save_snapshot(self.directory, store)
+        snapshot = load_snapshot(self.directory)
+        self.assertEqual(snapshot['node_ids'], ['a', 'b', 'c', 'd'])
+        self.assertEqual((snapshot['scaled_coords'], snapshot['layout']), (None, None))
+
+    def test_changes_are_not_written_back(self):
+        save_snapshot(self.directory, _store())
+        load_snapshot(self.directory)['nodes']['need'][:] = 7.
+        np.testing.assert_array_equal(load_snapshot(self.directory)['nodes']['need'], [np.nan, 2., -1., 3.])
+
+    def test_replace_layout(self):
+        save_snapshot(self.directory, _store(), layout=('old', []))
+        save_snapshot_layout(self.directory, ('new', []))
+        self.assertEqual(load_snapshot(self.directory)['layout'], ('new', []))
+
+    def test_tvis_round_trip(self):
+        nodes, edges = _network()
+        tvis = TVis(nodes, edges, use_pyplot=False, layout_cache=None)
+        tvis.compute_layout(with_node_ids=True)
+        tvis.to_snapshot(self.directory)
+        loaded = TVis.from_snapshot(self.directory, use_pyplot=False, layout_cache=None)
+        self.assertEqual([node._id for node in loaded.nodes], [node._id for node in tvis.nodes])
+        self.assertEqual(
+            [(edge._id, edge.s_node._id, edge.e_node._id) for edge in loaded.edges],
+            [(edge._id, edge.s_node._id, edge.e_node._id) for edge in tvis.edges]
+        )
+        self.assertEqual(loaded.snapshot_layout_key, tvis.layout[0])
+
+    def test_save_onto_the_loaded_snapshot(self):
+        # the columns of the loaded TVis are memory mapped from the files that are replaced
+        nodes, edges = _network(side=40)
+        TVis(nodes, edges, use_pyplot=False, layout_cache=None).to_snapshot(self.directory)
+        loaded = TVis.from_snapshot(self.directory, use_pyplot=False, layout_cache=None)
+        loaded.load_attack([1], [])
+        loaded.to_snapshot(self.directory)
+        functional = loaded.store.nodes_table['functional'].copy()
+        self.assertFalse(functional[1])
+        snapshot = load_snapshot(self.directory)
+        np.testing.assert_array_equal(snapshot['nodes']['functional'], functional)
+        np.testing.assert_array_equal(snapshot['nodes']['coords'], loaded.store.nodes_table['coords'])
+        self.assertEqual(snapshot['node_ids'], [node._id for node in loaded.nodes])
+
+
+if __name__ == '__main__':
+    unittest.main()
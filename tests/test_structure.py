@@ -0,0 +1,31 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the nodes and edges backed by a NetworkStore
+"""
+import unittest
+from flowvis.network import NetworkStore
+from flowvis.structure import Node, Edge
+
+
+class KwargsTest(unittest.TestCase):
+    def setUp(self):
+        store = NetworkStore()
+        self.start = Node(0, coords=(0., 0.), store=store)
+        self.end = Node(1, coords=(1., 0.), store=store, color='red')
+        self.edge = Edge(self.start, self.end, capacity=1.)
+
+    def test_changes_are_kept(self):
+        for element in (self.start, self.end, self.edge):
+            element.kwargs['width'] = 2.
+            self.assertEqual(element.kwargs['width'], 2.)
+        self.assertEqual(self.end.kwargs, {'color': 'red', 'width': 2.})
+
+    def test_assignment(self):
+        for element in (self.start, self.edge):
+            element.kwargs = {'color': 'blue'}
+            self.assertEqual(element.kwargs, {'color': 'blue'})
+        self.assertEqual(self.end.kwargs, {'color': 'red'})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,136 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of Vector and VectorArray
+"""
+import unittest
+import numpy as np
+from flowvis.packages.vecpy import Vector, VectorArray
+
+# the last rows hold a zero length vector, orthogonal vectors (a projection scale of 0)
+#   and parallel ones
+_STARTS = [(0., 0.), (1., 2.), (-3., 0.5), (2., 2.), (0., 0.), (1., 1.), (0., 0.)]
+_STOPS = [(3., 4.), (-1., 5.), (2., -2.5), (2., 2.), (0., 2.), (3., 1.), (2., 2.)]
+_OTHERS = [(1., 0.), (0.5, -2.), (4., 4.), (1., 1.), (3., 0.), (-2., 0.), (4., 4.)]
+
+
+def _row_wise(function, *vectors):
+    """
+    Apply function to the Vectors of each row, None where Vector divides by zero.
+    """
+    results = []
+    for row in zip(*vectors):
+        try:
+            results.append(function(*row))
+        except ZeroDivisionError:
+            results.append(None)
+    return results
+
+
+class VectorArrayTest(unittest.TestCase):
+    def setUp(self):
+        self.array = VectorArray(_STARTS, _STOPS)
+        self.others = VectorArray(_OTHERS)
+        self.vectors = [Vector(start, stop) for start, stop in zip(_STARTS, _STOPS)]
+        self.other_vectors = [Vector(other) for other in _OTHERS]
+
+    def _assert_rows(self, actual, expected):
+        """
+        Compare the rows of an array with numbers or Vectors, a row of None must not be finite.
+        """
+        actual = np.asarray(actual.coords if isinstance(actual, VectorArray) else actual)
+        self.assertEqual(len(actual), len(expected))
+        for row, value in zip(actual, expected):
+            if value is None:
+                self.assertFalse(np.isfinite(row).all())
+            else:
+                np.testing.assert_allclose(row, value.coords if isinstance(value, Vector) else value)
+
+    def test_components(self):
+        self._assert_rows(self.array, self.vectors)
+        self.assertEqual(list(self.array)[1].coords, self.vectors[1].coords)
+        self.assertEqual(self.array[-1].coords, self.vectors[-1].coords)
+        self._assert_rows(self.array[1:3], self.vectors[1:3])
+
+    def test_length(self):
+        self._assert_rows(self.array.length, [vec.length for vec in self.vectors])
+        self._assert_rows(self.array.squared_length, [vec.squared_length for vec in self.vectors])
+        self._assert_rows(self.array.norm('inf'), [vec.norm('inf') for vec in self.vectors])
+        self._assert_rows(self.array.norm(3), [vec.norm(3) for vec in self.vectors])
+
+    def test_unit(self):
+        self._assert_rows(self.array ^ 0, _row_wise(lambda vec: vec ^ 0, self.vectors))
+        self._assert_rows(self.array.unit, _row_wise(lambda vec: vec.unit, self.vectors))
+        self._assert_rows(self.array ^ 2.5, [vec ^ 2.5 for vec in self.vectors])
+        # a factor per vector, the zero factors give unit vectors
+        factors = np.array([0., 2., 0., 1., 3., 0., -1.])
+        self._assert_rows(
+            self.array ^ factors,
+            _row_wise(lambda vec, fct: vec ^ fct, self.vectors, factors.tolist())
+        )
+
+    def test_proj(self):
+        self._assert_rows(
+            self.array.proj(self.others, get_scale=True),
+            _row_wise(lambda vec, w: vec.proj(w, get_scale=True), self.vectors, self.other_vectors)
+        )
+        # the orthogonal row has a scale of 0, which gives the unit vector like for Vector
+        self._assert_rows(
+            self.array.proj(self.others), _row_wise(lambda vec, w: vec.proj(w), self.vectors, self.other_vectors)
+        )
+
+    def test_angle(self):
+        for degree in (False, True):
+            self._assert_rows(
+                self.array.angle(self.others, degree=degree),
+                _row_wise(lambda vec, w: vec.angle(w, degree=degree), self.vectors, self.other_vectors)
+            )
+        self._assert_rows(
+            self.array.angle(Vector(1., 1.)), _row_wise(lambda vec: vec.angle(Vector(1., 1.)), self.vectors)
+        )
+
+    def test_arithmetic(self):
+        self._assert_rows(self.array + self.others, [v + w for v, w in zip(self.vectors, self.other_vectors)])
+        self._assert_rows(self.array - self.others, [v - w for v, w in zip(self.vectors, self.other_vectors)])
+        self._assert_rows(self.array * 2., [v * 2. for v in self.vectors])
+        self._assert_rows(self.array * self.others, [v * w for v, w in zip(self.vectors, self.other_vectors)])
+        self._assert_rows(self.array.dot(Vector(1., 2.)), [v.dot(Vector(1., 2.)) for v in self.vectors])
+
+
+class VectorTest(unittest.TestCase):
+    def test_new(self):
+        vec = Vector._new(1., 2., 3.)
+        self.assertEqual(vec.coords, Vector(1., 2., 3.).coords)
+        self.assertEqual((vec.x, vec.y, vec.z), (1., 2., 3.))
+        self.assertFalse(hasattr(vec, '__dict__'))
+
+    def test_getitem(self):
+        vec = Vector(1., 2.)
+        self.assertEqual([vec[0], vec[1], vec[2], vec[-1]], [1., 2., 0., 0.])
+        self.assertEqual(vec[:2], (1., 2.))
+        self.assertRaises(IndexError, vec.__getitem__, 3)
+
+    def test_squared_length(self):
+        vec = Vector(start_point=(1., 1.), end_point=(4., 5.))
+        self.assertEqual(vec.squared_length, 25.)
+        self.assertEqual(vec.length, 5.)
+        self.assertEqual(Vector(0., 0.).squared_length, 0.)
+
+    def test_fast_paths_equal_sequences(self):
+        vec = Vector(1., 2., 3.)
+        other = Vector(-2., 0.5, 1.)
+        self.assertEqual((vec + other).coords, (vec + list(other)).coords)
+        self.assertEqual((vec - other).coords, (vec - list(other)).coords)
+        self.assertEqual(vec.dot(other), vec.dot(list(other)))
+        self.assertEqual((vec + 1).coords, (2., 3., 4.))
+        self.assertEqual((2 * vec).coords, (2., 4., 6.))
+
+    def test_zero_length(self):
+        vec = Vector(0., 0.)
+        self.assertRaises(ZeroDivisionError, vec.__xor__, 0)
+        self.assertRaises(ZeroDivisionError, vec.proj, Vector(1., 0.))
+        # a zero factor gives the unit vector, also as projection scale
+        self.assertEqual(Vector(0., 2.).proj(Vector(3., 0.)).coords, (0., 1., 0.))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+__author__ = 'Jonas I Liechti'
+DESC = """
+    Tests of the rendering of TVis
+"""
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import matplotlib
+matplotlib.use('Agg')
+from matplotlib.image import imread
+import numpy as np
+from flowvis.visualizer import TVis
+
+
+def _network(side=3):
+    """
+    Nodes on a slightly distorted grid, each connected to its right and upper neighbour.
+    """
+    rng = random.Random(1)
+    nodes = [
+        {
+            'ID': side * i + j, 'coords': (i + 0.3 * rng.random(), j + 0.3 * rng.random()),
+            'need': (0., 3., -5.)[(i + j) % 3], 'penalty': 2.
+        }
+        for i in xrange(side) for j in xrange(side)
+    ]
+    pairs = [(side * i + j, side * i + j + 1) for i in xrange(side) for j in xrange(side - 1)]
+    pairs += [(side * i + j, side * (i + 1) + j) for i in xrange(side - 1) for j in xrange(side)]
+    edges = [
+        {'ID': k, 'start_id': start_id, 'stop_id': stop_id, 'capacity': 10.}
+        for k, (start_id, stop_id) in enumerate(pairs)
+    ]
+    return nodes, edges
+
+
+def _configuration(nodes, edges, scale):
+    return (
+        {node['ID']: (scale * node['need'], scale) for node in nodes if node['need']},
+        {edge['ID']: scale * (edge['ID'] % 4) for edge in edges}
+    )
+
+
+class RestyleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def _tvis(self):
+        nodes, edges = _network()
+        return TVis(nodes, edges, use_pyplot=False, layout_cache=None), nodes, edges
+
+    def test_restyle_equals_fresh_render(self):
+        # node labels without ids fail in NodeVis._label, so the ids are shown
+        tvis, nodes, edges = self._tvis()
+        tvis.to_visual_elements(with_node_ids=True)
+        tvis.save_figure(os.path.join(self.directory, 'first.png'))
+        for k, scale in enumerate((0.5, 1.)):
+            tvis.load_config(_configuration(nodes, edges, scale))
+            tvis.restyle()
+            tvis.save_figure(os.path.join(self.directory, 'restyled_{}.png'.format(k)))
+            fresh, _, _ = self._tvis()
+            fresh.load_config(_configuration(nodes, edges, scale))
+            fresh.to_visual_elements(with_node_ids=True)
+            fresh.save_figure(os.path.join(self.directory, 'fresh_{}.png'.format(k)))
+            np.testing.assert_array_equal(
+                imread(os.path.join(self.directory, 'restyled_{}.png'.format(k))),
+                imread(os.path.join(self.directory, 'fresh_{}.png'.format(k)))
+            )
+
+    def test_reused_figure_equals_fresh_render(self):
+        tvis, nodes, edges = self._tvis()
+        for name in ('first', 'second'):
+            tvis.to_visual_elements(with_node_ids=True)
+            tvis.save_figure(os.path.join(self.directory, name + '.png'))
+        np.testing.assert_array_equal(
+            imread(os.path.join(self.directory, 'first.png')), imread(os.path.join(self.directory, 'second.png'))
+        )
+
+
+class ViewportTest(unittest.TestCase):
+    def _tvis(self):
+        nodes, edges = _network(side=4)
+        return TVis(nodes, edges, use_pyplot=False, layout_cache=None)
+
+    def test_only_the_region_is_drawn(self):
+        tvis = self._tvis()
+        tvis.to_visual_elements(with_node_ids=True, viewport=(-0.5, -0.5, 1.5, 1.5))
+        edge_rows, node_rows = tvis._visible_rows
+        nodes = [tvis.nodes[row] for row in node_rows]
+        self.assertEqual(sorted(node._id for node in nodes), [0, 1, 4, 5])
+        # the edges between the nodes in the region and the ones leaving it
+        self.assertEqual(len(edge_rows), 8)
+        self.assertEqual(tvis.ax_1.get_xlim(), tvis._scaled_viewport()[0::2])
+        tvis.set_viewport(None)
+        tvis.create_figure()
+        self.assertEqual([len(rows) for rows in tvis._visible_rows], [len(tvis.edges), len(tvis.nodes)])
+
+    def test_invalid_viewport(self):
+        tvis = self._tvis()
+        for viewport in ((1, 0, 0, 1), (0, 0, 1), ('a', 0, 1, 1), (0, 0, float('nan'), 1), 5):
+            self.assertRaises(AttributeError, tvis.set_viewport, viewport)
+            self.assertRaises(AttributeError, tvis.compute_layout, with_node_ids=True, viewport=viewport)
+
+
+if __name__ == '__main__':
+    unittest.main()